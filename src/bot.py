@@ -1,13 +1,26 @@
 import discord
 import asyncio
-from discord.ext import commands, tasks
+import functools
+import os
+import random
+import time
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Any, Dict
+from discord.ext import commands
 
 from config.settings import (
     MEMBER_UPDATE_INTERVAL,
     MESSAGE_UPDATE_INTERVAL,
     VOICE_UPDATE_INTERVAL,
     THREAD_UPDATE_INTERVAL,
-    PRESENCE_UPDATE_INTERVAL
+    PRESENCE_UPDATE_INTERVAL,
+    ENABLE_PRESENCE_TRACKING,
+    MESSAGE_BATCH_SIZE,
+    MESSAGE_BATCH_MAX_WAIT,
+    MESSAGE_BATCH_MIN_INTERVAL,
+    UPLOAD_MAX_ATTEMPTS,
+    DEAD_LETTER_DIR
 )
 from handlers import (
     MessageHandler, 
@@ -16,9 +29,20 @@ from handlers import (
     ThreadHandler, 
     PresenceHandler
 )
-from services.bigquery_service import BigQueryService
+from services.bigquery_service import BigQueryService, is_transient_error
 from services.data_buffer import DataBuffer
 from config.logging_config import BotLogger
+from utils.channel_cache import ChannelCache
+from utils.flush_scheduler import FlushScheduler
+
+# Buffers flushed to BigQuery: (stream, interval in minutes, friendly name)
+TASK_SCHEDULE = (
+    ('members', MEMBER_UPDATE_INTERVAL, 'Members'),
+    ('messages', MESSAGE_UPDATE_INTERVAL, 'Message Counts'),
+    ('voice', VOICE_UPDATE_INTERVAL, 'Voice Activity'),
+    ('threads', THREAD_UPDATE_INTERVAL, 'Threads'),
+    ('presence', PRESENCE_UPDATE_INTERVAL, 'Presence Logs'),
+)
 
 class DiscordAnalyticsBot(commands.Bot):
     """Main Discord bot class for analytics collection."""
@@ -26,7 +50,8 @@ class DiscordAnalyticsBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
         intents.members = True
-        intents.presences = True
+        # Presence updates are the largest gateway event stream; only subscribe when tracked
+        intents.presences = ENABLE_PRESENCE_TRACKING
         intents.guilds = True
         intents.message_content = True
         
@@ -39,12 +64,36 @@ class DiscordAnalyticsBot(commands.Bot):
         self.bigquery_service = BigQueryService()
         self.data_buffer = DataBuffer()
         
+        # Channel metadata shared by handlers, invalidated on channel changes
+        self.channel_cache = ChannelCache()
+        
+        # Every flush is dispatched by one scheduler coroutine
+        self.flush_scheduler = FlushScheduler(on_error=lambda e: self.logger.error("run flush task", e))
+        flushes = {
+            'members': self.update_members,
+            'messages': self.update_messages,
+            'voice': self.update_voice_activity,
+            'threads': self.update_threads,
+            'presence': self.update_presence_logs
+        }
+        self._flush_schedule = [
+            (stream, flushes[stream], interval, friendly_name)
+            for stream, interval, friendly_name in TASK_SCHEDULE
+            if stream != 'presence' or ENABLE_PRESENCE_TRACKING
+        ]
+        
+        # One flush per buffer at a time (timer or high-water), different buffers run in parallel
+        self._flush_locks = {stream: asyncio.Lock() for stream, _, _, _ in self._flush_schedule}
+        self._high_water_tasks = []
+        self._heartbeat_task = None
+        self._message_writer_task = None
+        
         # Initialize handlers
-        self.message_handler = MessageHandler(self.data_buffer)
+        self.message_handler = MessageHandler(self.data_buffer, self.channel_cache)
         self.member_handler = MemberHandler(self.data_buffer)
         self.voice_handler = VoiceHandler(self.data_buffer)
         self.thread_handler = ThreadHandler(self.data_buffer)
-        self.presence_handler = PresenceHandler(self.data_buffer)
+        self.presence_handler = PresenceHandler(self.data_buffer) if ENABLE_PRESENCE_TRACKING else None
         
         # Setup event handlers
         self._setup_event_handlers()
@@ -60,30 +109,8 @@ class DiscordAnalyticsBot(commands.Bot):
         self.add_listener(self.member_handler.on_user_update)
         self.add_listener(self.voice_handler.on_voice_state_update)
         self.add_listener(self.thread_handler.on_thread_create)
-        self.add_listener(self.presence_handler.on_presence_update)
-    
-    def _calculate_task_delays(self):
-        """Calculate appropriate delays between tasks based on intervals."""
-        # Encontra o menor intervalo entre todas as tarefas
-        intervals = [
-            MEMBER_UPDATE_INTERVAL,
-            MESSAGE_UPDATE_INTERVAL,
-            VOICE_UPDATE_INTERVAL,
-            THREAD_UPDATE_INTERVAL,
-            PRESENCE_UPDATE_INTERVAL
-        ]
-        min_interval = min(intervals)
-        
-        # Calcula delay apropriado baseado no menor intervalo
-        if min_interval <= 5:  # Para testes (≤ 5 minutos)
-            base_delay = 10  # 10 segundos entre tarefas
-        elif min_interval <= 15:  # Intervalos médios (≤ 15 minutos)  
-            base_delay = 30  # 30 segundos entre tarefas
-        else:  # Produção (≥ 16 minutos) - inclui o padrão de 60 min
-            base_delay = 300  # 5 minutos entre tarefas
-            
-        self.logger.logger.info(f"📊 Calculated task delay: {base_delay}s (based on min interval: {min_interval}min)")
-        return base_delay
+        if self.presence_handler:
+            self.add_listener(self.presence_handler.on_presence_update)
     
     async def on_ready(self):
         """Event triggered when bot is ready."""
@@ -91,168 +118,245 @@ class DiscordAnalyticsBot(commands.Bot):
         
         for guild in self.guilds:
             self.logger.guild_connected(guild.name, guild.id)
+            self.message_handler.warm_channel_cache(guild)
         
         # Log the configured intervals
         self.logger.logger.info("⚙️ Task Configuration:")
-        intervals = [
-            ("Members", MEMBER_UPDATE_INTERVAL),
-            ("Messages", MESSAGE_UPDATE_INTERVAL), 
-            ("Voice Activity", VOICE_UPDATE_INTERVAL),
-            ("Threads", THREAD_UPDATE_INTERVAL),
-            ("Presence Logs", PRESENCE_UPDATE_INTERVAL)
-        ]
+        for _, _, interval, friendly_name in self._flush_schedule:
+            self.logger.logger.info(f"   • {friendly_name}: {interval} minutes")
         
-        for name, interval in intervals:
-            self.logger.logger.info(f"   • {name}: {interval} minutes")
+        if not ENABLE_PRESENCE_TRACKING:
+            self.logger.logger.info("   • Presence Logs: disabled")
         
         # Start periodic tasks
         await self._start_periodic_tasks()
     
+    async def close(self):
+        """Close the Discord connection and release BigQuery resources."""
+        self.flush_scheduler.stop()
+        await super().close()
+        self.bigquery_service.close()
+    
+    async def on_guild_channel_update(self, before, after):
+        """Drop cached metadata for an updated channel."""
+        self.channel_cache.invalidate(after.id)
+    
+    async def on_guild_channel_delete(self, channel):
+        """Drop cached metadata for a deleted channel."""
+        self.channel_cache.invalidate(channel.id)
+    
+    async def on_thread_delete(self, thread):
+        """Drop cached metadata for a deleted thread."""
+        self.channel_cache.invalidate(thread.id)
+    
     async def _start_periodic_tasks(self):
-        """Start all periodic update tasks with intelligent delays."""
+        """Start the heartbeat and the scheduler that drives all updates."""
         self.logger.logger.info("🔄 Starting periodic tasks...")
         
-        # Calculate appropriate delay between tasks
-        task_delay = self._calculate_task_delays()
+        if self.flush_scheduler.is_running():
+            # on_ready fires again after a reconnect; the scheduler is already up
+            return
         
         # Start heartbeat log cycle (sempre 1 hora, independente dos outros intervalos)
         heartbeat_interval = max(60, min(MEMBER_UPDATE_INTERVAL, MESSAGE_UPDATE_INTERVAL) * 10)
-        self.log_update_cycle.change_interval(minutes=heartbeat_interval)
-        self.log_update_cycle.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat(heartbeat_interval))
         self.logger.logger.debug(f"Started heartbeat log cycle ({heartbeat_interval} min interval)")
         
-        # Define tasks with their respective intervals and calculated delays
-        tasks = [
-            ("update_members", MEMBER_UPDATE_INTERVAL, task_delay * 0),      # Inicia imediatamente
-            ("update_messages", MESSAGE_UPDATE_INTERVAL, task_delay * 1),    # 1 delay
-            ("update_voice_activity", VOICE_UPDATE_INTERVAL, task_delay * 2), # 2 delays
-            ("update_threads", THREAD_UPDATE_INTERVAL, task_delay * 3),      # 3 delays
-            ("update_presence_logs", PRESENCE_UPDATE_INTERVAL, task_delay * 4) # 4 delays
-        ]
+        # Ramp-up: spread the first runs linearly across the shortest interval so
+        # the updates never all hit BigQuery at the same instant
+        ramp_seconds = min(interval for _, _, interval, _ in self._flush_schedule) * 60
         
-        # Log the schedule
         self.logger.logger.info("📅 Task Schedule:")
-        for task_name, interval, delay in tasks:
-            friendly_name = task_name.replace('update_', '').replace('_', ' ').title()
-            delay_str = f"{int(delay)}s" if delay < 60 else f"{int(delay/60)}m"
-            self.logger.logger.info(f"   • {friendly_name}: starts in {delay_str}, then every {interval}min")
-        
-        # Start tasks with calculated delays
-        for task_name, interval, delay in tasks:
-            if delay > 0:
-                self.logger.logger.debug(f"⏳ Waiting {int(delay)}s before starting {task_name}")
-                await asyncio.sleep(delay)
-            
-            task = getattr(self, task_name)
-            task.change_interval(minutes=interval)
-            task.start()
+        for index, (stream, flush, interval, friendly_name) in enumerate(self._flush_schedule):
+            offset = index * ramp_seconds / len(self._flush_schedule)
+            self.flush_scheduler.add(
+                functools.partial(self._run_flush, stream, flush),
+                interval_seconds=interval * 60,
+                delay_seconds=offset
+            )
             
-            friendly_name = task_name.replace('update_', '').replace('_', ' ').title()
-            self.logger.logger.info(f"✅ Started {friendly_name} (every {interval}min)")
+            offset_str = f"{int(offset)}s" if offset < 60 else f"{int(offset/60)}m"
+            self.logger.logger.info(f"   • {friendly_name}: starts in {offset_str}, then every {interval}min")
+        
+        self.flush_scheduler.start()
+        
+        # Message details bypass the schedule and stream out in batches
+        self._message_writer_task = asyncio.create_task(self._message_writer())
+        self.logger.logger.info(f"   • Message Details: batches of up to {MESSAGE_BATCH_SIZE} rows or {MESSAGE_BATCH_MAX_WAIT}s")
+        
+        # Flush a buffer early whenever it crosses its high-water mark
+        self._high_water_tasks = [
+            asyncio.create_task(self._flush_on_high_water(stream, flush))
+            for stream, flush, _, _ in self._flush_schedule
+        ]
         
         self.logger.logger.info("🎯 All periodic tasks started successfully")
     
-    @tasks.loop()
-    async def log_update_cycle(self):
+    async def _heartbeat(self, interval: int):
         """Log periodic heartbeat."""
-        # Mostra informações mais úteis no heartbeat
-        total_tasks = 5
-        active_tasks = sum(1 for task in [
-            self.update_members.is_running(),
-            self.update_messages.is_running(),
-            self.update_voice_activity.is_running(),
-            self.update_threads.is_running(),
-            self.update_presence_logs.is_running()
-        ] if task)
+        while not self.is_closed():
+            await asyncio.sleep(interval * 60)
+            status = "running" if self.flush_scheduler.is_running() else "stopped"
+            self.logger.logger.info(
+                f"💓 System Health: flush scheduler {status} ({self.flush_scheduler.dispatched} flushes dispatched, "
+                f"{self.data_buffer.dropped_rows()} rows dropped on full buffers)"
+            )
+    
+    async def _message_writer(self):
+        """Upload queued message details as soon as a batch is collected."""
+        last_batch = float('-inf')
+        while not self.is_closed():
+            # Every batch is a load job and tables allow 1500 a day: under heavy traffic
+            # let rows queue up in the buffer instead of starting another job right away
+            wait = last_batch + MESSAGE_BATCH_MIN_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            
+            batch = await self.data_buffer.get_message_details_batch(MESSAGE_BATCH_SIZE, MESSAGE_BATCH_MAX_WAIT)
+            last_batch = time.monotonic()
+            await self._upload(self.bigquery_service.update_message_details, {'message_details': batch})
+    
+    async def _flush_on_high_water(self, stream: str, flush):
+        """Flush a buffer as soon as it fills up, without waiting for the timer."""
+        lock = self._flush_locks[stream]
+        while not self.is_closed():
+            await self.data_buffer.wait_for_high_water(stream)
+            
+            # Wait out a flush already draining this buffer instead of skipping it: every row
+            # added meanwhile signals again, so check the buffer afresh once the flush is done
+            async with lock:
+                if not self.data_buffer.reset_high_water(stream):
+                    continue
+                self.logger.logger.info(f"🌊 {stream.title()} buffer reached its high-water mark, flushing early")
+                await flush()
+    
+    async def _run_flush(self, stream: str, flush):
+        """Run a scheduled flush unless the previous one for the same buffer is still in progress."""
+        lock = self._flush_locks[stream]
+        if lock.locked():
+            # Skip rather than queue up: the running flush is already draining this buffer
+            self.logger.logger.warning(f"⚠️ {stream.title()} flush still in progress, skipping this run")
+            return
         
-        self.logger.logger.info(f"💓 System Health: {active_tasks}/{total_tasks} tasks running")
+        async with lock:
+            await flush()
+    
+    async def _upload(self, upload, batches: Dict[str, Any]) -> bool:
+        """Upload row batches, retrying transient errors and dead-lettering rows that never make it."""
+        name = ', '.join(batches)
+        
+        for attempt in range(1, UPLOAD_MAX_ATTEMPTS + 1):
+            try:
+                await upload(*batches.values())
+                return True
+            except Exception as e:
+                # Permission, schema and query errors fail the same way on every attempt
+                if not is_transient_error(e):
+                    self.logger.error(f"upload {name}", e)
+                    break
+                if attempt == UPLOAD_MAX_ATTEMPTS:
+                    self.logger.error(f"upload {name}", e, f"gave up after {attempt} attempts")
+                    break
+                # Exponential backoff with jitter so retries don't hit BigQuery in lockstep
+                delay = 2 ** attempt + random.random()
+                self.logger.logger.warning(f"⚠️ Upload of {name} failed (attempt {attempt}/{UPLOAD_MAX_ATTEMPTS}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+        
+        await self._write_dead_letters(batches)
+        return False
+    
+    async def _write_dead_letters(self, batches: Dict[str, Any]):
+        """Save rows that could not be uploaded so they can be replayed later."""
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        
+        for name, rows in batches.items():
+            # Batches are lists of row dicts or, for columnar buffers, dicts of column lists
+            df = pd.DataFrame(rows)
+            if df.empty:
+                continue
+            path = os.path.join(DEAD_LETTER_DIR, f"{name}_{timestamp}.parquet")
+            try:
+                os.makedirs(DEAD_LETTER_DIR, exist_ok=True)
+                await asyncio.to_thread(df.to_parquet, path, index=False)
+                self.logger.logger.warning(f"📥 Saved {len(df)} {name} rows to dead-letter file {path}")
+            except Exception as e:
+                self.logger.error(f"write dead-letter file {path}", e, f"{len(df)} rows lost")
     
-    @tasks.loop()
     async def update_members(self):
         """Update member data in BigQuery."""
         self.logger.logger.info("👥 Starting member data update process...")
         
         try:
-            members_data = self.data_buffer.get_members_data()
-            updates_data = self.data_buffer.get_member_updates()
-            
-            if not members_data.empty or not updates_data.empty:
-                await self.bigquery_service.update_members(members_data, updates_data)
-                self.data_buffer.clear_members_data()
-            else:
+            # Cheap length check first so idle runs allocate nothing
+            if not self.data_buffer.members_pending():
                 self.logger.logger.info("👥 Member update process completed - No data to load")
+                return
+            
+            members_data = self.data_buffer.drain_members_data()
+            updates_data = self.data_buffer.drain_member_updates()
+            
+            # Rows leave the buffer before the upload; failed uploads are dead-lettered
+            await self._upload(self.bigquery_service.update_members, {'members': members_data, 'member_updates': updates_data})
                 
         except Exception as e:
             self.logger.error("update members task", e)
     
-    @tasks.loop()
     async def update_messages(self):
-        """Update message data in BigQuery."""
-        self.logger.logger.info("💌 Starting message data update process...")
+        """Update message counts in BigQuery (details are streamed by the message writer)."""
+        self.logger.logger.info("💌 Starting message count update process...")
         
         try:
-            counts_data = self.data_buffer.get_message_counts()
-            details_data = self.data_buffer.get_message_details()
+            if not self.data_buffer.messages_pending():
+                self.logger.logger.info("💌 Message count update process completed - No data to load")
+                return
             
-            if not counts_data.empty or not details_data.empty:
-                if not counts_data.empty:
-                    await self.bigquery_service.update_message_counts(counts_data)
-                if not details_data.empty:
-                    await self.bigquery_service.update_message_details(details_data)
-                self.data_buffer.clear_message_data()
-            else:
-                self.logger.logger.info("💌 Message update process completed - No data to load")
+            counts_data = self.data_buffer.drain_message_counts()
+            await self._upload(self.bigquery_service.update_message_counts, {'message_counts': counts_data})
                 
         except Exception as e:
             self.logger.error("update messages task", e)
     
-    @tasks.loop()
     async def update_voice_activity(self):
         """Update voice activity data in BigQuery."""
         self.logger.logger.info("🎙️ Starting voice activity update process...")
         
         try:
-            voice_data = self.data_buffer.get_voice_data()
-            
-            if not voice_data.empty:
-                await self.bigquery_service.update_voice_activity(voice_data)
-                self.data_buffer.clear_voice_data()
-            else:
+            if not self.data_buffer.voice_pending():
                 self.logger.logger.info("🎙️ Voice activity update process completed - No data to load")
+                return
+            
+            voice_data = self.data_buffer.drain_voice_data()
+            await self._upload(self.bigquery_service.update_voice_activity, {'voice_activity': voice_data})
                 
         except Exception as e:
             self.logger.error("update voice activity task", e)
     
-    @tasks.loop()
     async def update_threads(self):
         """Update thread data in BigQuery."""
         self.logger.logger.info("🧵 Starting thread data update process...")
         
         try:
-            thread_data = self.data_buffer.get_thread_data()
-            
-            if not thread_data.empty:
-                await self.bigquery_service.update_threads(thread_data)
-                self.data_buffer.clear_thread_data()
-            else:
+            if not self.data_buffer.threads_pending():
                 self.logger.logger.info("🧵 Thread update process completed - No data to load")
+                return
+            
+            thread_data = self.data_buffer.drain_thread_data()
+            await self._upload(self.bigquery_service.update_threads, {'threads': thread_data})
                 
         except Exception as e:
             self.logger.error("update threads task", e)
     
-    @tasks.loop()
     async def update_presence_logs(self):
         """Update presence logs in BigQuery."""
         self.logger.logger.info("🟢 Starting presence logs update process...")
         
         try:
-            presence_data = self.data_buffer.get_presence_data()
-            
-            if not presence_data.empty:
-                await self.bigquery_service.update_presence_logs(presence_data)
-                self.data_buffer.clear_presence_data()
-            else:
+            if not self.data_buffer.presence_pending():
                 self.logger.logger.info("🟢 Presence logs update process completed - No data to load")
+                return
+            
+            presence_data = self.data_buffer.drain_presence_data()
+            await self._upload(self.bigquery_service.update_presence_logs, {'presence_logs': presence_data})
                 
         except Exception as e:
             self.logger.error("update presence logs task", e)
\ No newline at end of file
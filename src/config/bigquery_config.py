@@ -1,19 +1,39 @@
+from google.auth import default as default_credentials
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import bigquery
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
 import os
 import json
 import logging
-from .settings import PROJECT_ID
+import functools
+from types import MappingProxyType
+from .settings import PROJECT_ID, BIGQUERY_MAX_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
+def _build_client(credentials, project: str) -> bigquery.Client:
+    """Create a BigQuery client on a session that keeps a connection per worker thread alive."""
+    # Concurrent workers reuse pooled connections instead of opening (and
+    # TLS-handshaking) new ones when requests' default pool of 10 runs out
+    session = AuthorizedSession(credentials)
+    session.mount('https://', HTTPAdapter(pool_maxsize=max(BIGQUERY_MAX_CONCURRENCY, 10)))
+    return bigquery.Client(project=project, credentials=credentials, _http=session)
+
+def _client_from_service_account_file(path: str) -> bigquery.Client:
+    """Create a BigQuery client from a service account JSON file."""
+    credentials = service_account.Credentials.from_service_account_file(path, scopes=bigquery.Client.SCOPE)
+    return _build_client(credentials, credentials.project_id)
+
+@functools.lru_cache(maxsize=1)
 def get_bigquery_client():
-    """Get BigQuery client instance with file-based service account info."""
+    """Get the process-wide BigQuery client, resolving credentials on the first call only."""
     try:
         # Method 1: Try to use service account file path from environment
         service_account_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
         if service_account_path and os.path.exists(service_account_path):
             logger.info(f"Using service account file from GOOGLE_APPLICATION_CREDENTIALS: {service_account_path}")
-            return bigquery.Client.from_service_account_json(service_account_path)
+            return _client_from_service_account_file(service_account_path)
         
         # Method 2: Check if GOOGLE_SERVICE_ACCOUNT_INFO contains a file path
         service_account_info = os.getenv('GOOGLE_SERVICE_ACCOUNT_INFO')
@@ -21,10 +41,8 @@ def get_bigquery_client():
             service_account_info = service_account_info.strip()
             
             # Check if it's a file path (ends with .json or starts with /)
-            if (service_account_info.endswith('.json') or 
-                service_account_info.startswith('/') or 
-                service_account_info.startswith('./') or
-                service_account_info.startswith('../')):
+            if (service_account_info.endswith('.json') or
+                service_account_info.startswith(('/', './', '../'))):
                 
                 logger.info(f"GOOGLE_SERVICE_ACCOUNT_INFO appears to be a file path: {service_account_info}")
                 
@@ -32,7 +50,7 @@ def get_bigquery_client():
                 if os.path.exists(service_account_info):
                     try:
                         logger.info(f"Reading service account JSON from file: {service_account_info}")
-                        return bigquery.Client.from_service_account_json(service_account_info)
+                        return _client_from_service_account_file(service_account_info)
                     except Exception as e:
                         logger.error(f"Failed to read service account file {service_account_info}: {e}")
                 else:
@@ -52,7 +70,10 @@ def get_bigquery_client():
                         raise ValueError(f"Missing required fields: {missing_fields}")
                     
                     logger.info("Successfully parsed service account JSON from environment variable")
-                    return bigquery.Client.from_service_account_info(service_account_data)
+                    credentials = service_account.Credentials.from_service_account_info(
+                        service_account_data, scopes=bigquery.Client.SCOPE
+                    )
+                    return _build_client(credentials, credentials.project_id)
                     
                 except json.JSONDecodeError as e:
                     logger.error(f"Failed to parse GOOGLE_SERVICE_ACCOUNT_INFO as JSON: {e}")
@@ -72,14 +93,15 @@ def get_bigquery_client():
             if os.path.exists(path):
                 logger.info(f"Found service account file at common location: {path}")
                 try:
-                    return bigquery.Client.from_service_account_json(path)
+                    return _client_from_service_account_file(path)
                 except Exception as e:
                     logger.warning(f"Failed to use service account file {path}: {e}")
                     continue
         
         # Final fallback: Use default credentials
         logger.info("Using default Google Cloud credentials")
-        return bigquery.Client(project=PROJECT_ID)
+        credentials, _ = default_credentials(scopes=bigquery.Client.SCOPE)
+        return _build_client(credentials, PROJECT_ID)
         
     except Exception as e:
         logger.error(f"Failed to create BigQuery client: {e}")
@@ -95,16 +117,17 @@ def get_bigquery_client():
             pass
         
         # Show environment variables for debugging
-        google_env_vars = {k: v[:50] + '...' if len(v) > 50 else v 
-                          for k, v in os.environ.items() 
-                          if 'GOOGLE' in k or 'SERVICE' in k}
-        logger.error(f"Google-related environment variables: {google_env_vars}")
+        if logger.isEnabledFor(logging.ERROR):
+            google_env_vars = {k: v[:50] + '...' if len(v) > 50 else v 
+                              for k, v in os.environ.items() 
+                              if 'GOOGLE' in k or 'SERVICE' in k}
+            logger.error(f"Google-related environment variables: {google_env_vars}")
         
         raise
 
-# BigQuery table schemas
-SCHEMAS = {
-    'members': [
+# BigQuery table schemas (read-only: tuples in a mapping proxy, shared by every load job)
+SCHEMAS = MappingProxyType({
+    'members': (
         bigquery.SchemaField("user_id", "STRING"),
         bigquery.SchemaField("user_name", "STRING"),
         bigquery.SchemaField("display_name", "STRING"),
@@ -114,37 +137,41 @@ SCHEMAS = {
         bigquery.SchemaField("joined_at", "TIMESTAMP"),
         bigquery.SchemaField("status", "STRING"),
         bigquery.SchemaField("updated_at", "TIMESTAMP"),
-    ],
-    'message_counts': [
+    ),
+    'message_counts': (
         bigquery.SchemaField("date", "DATE"),
         bigquery.SchemaField("user_id", "STRING"),
         bigquery.SchemaField("channel_id", "STRING"),
         bigquery.SchemaField("message_count", "INTEGER"),
-    ],
-    'message_details': [
+    ),
+    'message_details': (
         bigquery.SchemaField("message_id", "STRING"),
         bigquery.SchemaField("created_at", "TIMESTAMP"),
         bigquery.SchemaField("user_id", "STRING"),
         bigquery.SchemaField("channel_id", "STRING"),
         bigquery.SchemaField("thread_id", "STRING"),
         bigquery.SchemaField("message_content", "STRING"),
-    ],
-    'voice_activity': [
+    ),
+    'voice_activity': (
         bigquery.SchemaField("date", "DATE"),
         bigquery.SchemaField("user_id", "STRING"),
         bigquery.SchemaField("channel_id", "STRING"),
         bigquery.SchemaField("duration_seconds", "INTEGER"),
-    ],
-    'threads': [
+    ),
+    'threads': (
         bigquery.SchemaField("created_at", "TIMESTAMP"),
         bigquery.SchemaField("user_id", "STRING"),
         bigquery.SchemaField("thread_name", "STRING"),
         bigquery.SchemaField("channel_id", "STRING"),
         bigquery.SchemaField("thread_id", "STRING"),
-    ],
-    'presence_logs': [
+    ),
+    'presence_logs': (
         bigquery.SchemaField("logged_at", "TIMESTAMP"),
         bigquery.SchemaField("user_id", "STRING"),
         bigquery.SchemaField("user_name", "STRING"),
-    ]
-}
\ No newline at end of file
+    )
+})
+# Member staging rows: full rows from joins (is_upsert) and partial rows from field updates
+MEMBER_STAGING_SCHEMA = SCHEMAS['members'] + (
+    bigquery.SchemaField("is_upsert", "BOOLEAN"),
+)
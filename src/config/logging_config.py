@@ -1,7 +1,9 @@
 import logging
+import logging.handlers
+import queue
 import sys
-from datetime import datetime
-from typing import Dict, Any
+import time
+from typing import Dict
 
 class DiscordBotFormatter(logging.Formatter):
     """Custom formatter for Discord Analytics Bot logs."""
@@ -33,23 +35,46 @@ class DiscordBotFormatter(logging.Formatter):
         'timing': '⏱️'
     }
     
+    # Short level names for colored output
+    LEVEL_NAMES = {
+        'DEBUG': 'DBG',
+        'INFO': 'INF',
+        'WARNING': 'WRN',
+        'ERROR': 'ERR',
+        'CRITICAL': 'CRT'
+    }
+    
+    # Categories matched against the logger name (in order) and, failing that, the message
+    MODULE_CATEGORIES = ('bigquery', 'voice', 'member', 'thread', 'message', 'presence')
+    MESSAGE_CATEGORIES = ('voice', 'member', 'thread', 'message', 'presence')
+    
     def __init__(self, use_colors: bool = True):
         super().__init__()
         self.use_colors = use_colors and sys.stdout.isatty()
+        
+        # Logger name -> (module category or None, is bot module), resolved once per logger
+        self._module_categories: Dict[str, tuple] = {}
+        
+        # Last formatted second; records within the same second reuse the string
+        self._ts_second = -1
+        self._ts_text = ''
     
     def format(self, record: logging.LogRecord) -> str:
         """Format log record with colors and icons."""
         # Get timestamp
-        timestamp = datetime.fromtimestamp(record.created).strftime('%H:%M:%S')
+        timestamp = self._format_timestamp(record.created)
+        
+        # Interpolate the message once; categorizing and formatting both read it
+        message = record.getMessage()
         
         # Determine category and icon
-        category, icon = self._categorize_record(record)
+        category, icon = self._categorize_record(record, message)
         
         # Format level with color
         level_str = self._format_level(record.levelname)
         
         # Create the main message
-        message = self._format_message(record, category)
+        message = self._format_message(record, message, category)
         
         # Combine all parts
         if self.use_colors:
@@ -57,31 +82,41 @@ class DiscordBotFormatter(logging.Formatter):
         else:
             return f"{timestamp} {icon} [{record.levelname}] {message}"
     
-    def _categorize_record(self, record: logging.LogRecord) -> tuple[str, str]:
+    def _format_timestamp(self, created: float) -> str:
+        """Return HH:MM:SS for a record time, formatting each second only once."""
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_text = time.strftime('%H:%M:%S', time.localtime(second))
+            self._ts_second = second
+        return self._ts_text
+    
+    def _module_category(self, logger_name: str) -> tuple:
+        """Return the cached (category, is bot module) for a logger name."""
+        cached = self._module_categories.get(logger_name)
+        if cached is None:
+            module_name = logger_name.lower()
+            category = next((c for c in self.MODULE_CATEGORIES if c in module_name), None)
+            cached = self._module_categories[logger_name] = (category, 'bot' in module_name)
+        return cached
+    
+    def _categorize_record(self, record: logging.LogRecord, message: str) -> tuple[str, str]:
         """Categorize log record and return category and appropriate icon."""
-        module_name = record.name.lower()
-        message = record.getMessage().lower()
-        
         # Error and warning handling
         if record.levelno >= logging.ERROR:
             return 'error', self.ICONS['error']
         elif record.levelno >= logging.WARNING:
             return 'warning', self.ICONS['warning']
         
-        # Module-based categorization
-        if 'bigquery' in module_name:
-            return 'bigquery', self.ICONS['bigquery']
-        elif 'voice' in module_name or 'voice' in message:
-            return 'voice', self.ICONS['voice']
-        elif 'member' in module_name or 'member' in message:
-            return 'member', self.ICONS['member']
-        elif 'thread' in module_name or 'thread' in message:
-            return 'thread', self.ICONS['thread']
-        elif 'message' in module_name or 'message' in message:
-            return 'message', self.ICONS['message']
-        elif 'presence' in module_name or 'presence' in message:
-            return 'presence', self.ICONS['presence']
-        elif 'bot' in module_name:
+        # Module-based categorization (no message scan for handler/service loggers)
+        category, is_bot_module = self._module_category(record.name)
+        if category:
+            return category, self.ICONS[category]
+        
+        message = message.lower()
+        for category in self.MESSAGE_CATEGORIES:
+            if category in message:
+                return category, self.ICONS[category]
+        if is_bot_module:
             return 'bot', self.ICONS['bot']
         
         # Content-based categorization
@@ -96,19 +131,10 @@ class DiscordBotFormatter(logging.Formatter):
     
     def _format_level(self, level: str) -> str:
         """Format log level string."""
-        level_map = {
-            'DEBUG': 'DBG',
-            'INFO': 'INF',
-            'WARNING': 'WRN',
-            'ERROR': 'ERR',
-            'CRITICAL': 'CRT'
-        }
-        return level_map.get(level, level[:3])
-    
-    def _format_message(self, record: logging.LogRecord, category: str) -> str:
+        return self.LEVEL_NAMES.get(level, level[:3])
+    
+    def _format_message(self, record: logging.LogRecord, message: str, category: str) -> str:
         """Format the main log message."""
-        message = record.getMessage()
-        
         # Special formatting for different types of messages
         if 'completed in' in message:
             return self._format_timing_message(message)
@@ -144,6 +170,10 @@ class DiscordBotFormatter(logging.Formatter):
         return message
 
 
+# Background thread writing log records to the console and files (see setup_logging)
+_log_listener = None
+
+
 def setup_logging(level: str = 'INFO', use_colors: bool = True) -> None:
     """Setup logging configuration for the Discord Analytics Bot."""
     
@@ -156,7 +186,6 @@ def setup_logging(level: str = 'INFO', use_colors: bool = True) -> None:
     # Setup console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    console_handler.setLevel(numeric_level)
     
     # Setup file handler (without colors)
     try:
@@ -166,7 +195,6 @@ def setup_logging(level: str = 'INFO', use_colors: bool = True) -> None:
         file_formatter = DiscordBotFormatter(use_colors=False)
         file_handler = logging.FileHandler('logs/discord-bot.log', encoding='utf-8')
         file_handler.setFormatter(file_formatter)
-        file_handler.setLevel(numeric_level)
         
         # Setup error file handler
         error_handler = logging.FileHandler('logs/error.log', encoding='utf-8')
@@ -177,10 +205,22 @@ def setup_logging(level: str = 'INFO', use_colors: bool = True) -> None:
     except Exception:
         handlers = [console_handler]
     
+    # The root logger only enqueues records; a listener thread does the actual
+    # console/file writes so logging never blocks the event loop on I/O
+    global _log_listener
+    stop_logging()
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    
+    # The queue handler only interpolates the message; the listener's handlers do the real formatting
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
     # Configure root logger
     logging.basicConfig(
         level=numeric_level,
-        handlers=handlers,
+        handlers=[queue_handler],
         force=True  # Override any existing configuration
     )
     
@@ -191,6 +231,14 @@ def setup_logging(level: str = 'INFO', use_colors: bool = True) -> None:
     logging.getLogger('aiohttp').setLevel(logging.WARNING)
 
 
+def stop_logging() -> None:
+    """Flush queued log records and stop the logging listener thread."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance with the specified name."""
     return logging.getLogger(name)
@@ -205,44 +253,46 @@ class BotLogger:
     
     def bot_ready(self, bot_name: str, guild_count: int):
         """Log when bot is ready."""
-        self.logger.info(f"Bot '{bot_name}' is ready! Connected to {guild_count} server(s)")
+        self.logger.info("Bot '%s' is ready! Connected to %d server(s)", bot_name, guild_count)
     
     def guild_connected(self, guild_name: str, guild_id: int):
         """Log guild connection."""
-        self.logger.info(f"Connected to server: {guild_name} (ID: {guild_id})")
+        self.logger.info("Connected to server: %s (ID: %s)", guild_name, guild_id)
     
     def task_started(self, task_name: str, interval: int):
         """Log when a periodic task starts."""
-        self.logger.info(f"Started {task_name.replace('_', ' ')} with {interval} minute interval")
+        self.logger.info("Started %s with %d minute interval", task_name.replace('_', ' '), interval)
     
     def data_processed(self, operation: str, count: int, table: str = None):
         """Log data processing results."""
         if table:
-            self.logger.info(f"Successfully processed {count} {operation} records → {table}")
+            self.logger.info("Successfully processed %d %s records → %s", count, operation, table)
         else:
-            self.logger.info(f"Successfully processed {count} {operation} records")
+            self.logger.info("Successfully processed %d %s records", count, operation)
     
     def no_data(self, operation: str):
         """Log when there's no data to process."""
-        self.logger.debug(f"No {operation} data to process")
+        self.logger.debug("No %s data to process", operation)
     
     def timing(self, operation: str, minutes: int, seconds: int):
         """Log operation timing."""
+        name = operation.replace('_', ' ').title()
         if minutes > 0:
-            self.logger.info(f"{operation.replace('_', ' ').title()} completed in {minutes}m {seconds}s")
+            self.logger.info("%s completed in %dm %ds", name, minutes, seconds)
         else:
-            self.logger.info(f"{operation.replace('_', ' ').title()} completed in {seconds}s")
+            self.logger.info("%s completed in %ds", name, seconds)
     
     def user_activity(self, activity_type: str, user_id: str, details: str = None):
         """Log user activity."""
+        # Called for every gateway event: let logging skip the formatting when DEBUG is off
         if details:
-            self.logger.debug(f"User {user_id} {activity_type}: {details}")
+            self.logger.debug("User %s %s: %s", user_id, activity_type, details)
         else:
-            self.logger.debug(f"User {user_id} {activity_type}")
+            self.logger.debug("User %s %s", user_id, activity_type)
     
     def error(self, operation: str, error: Exception, context: str = None):
         """Log errors with context."""
         if context:
-            self.logger.error(f"Failed to {operation} ({context}): {error}")
+            self.logger.error("Failed to %s (%s): %s", operation, context, error)
         else:
-            self.logger.error(f"Failed to {operation}: {error}")
\ No newline at end of file
+            self.logger.error("Failed to %s: %s", operation, error)
\ No newline at end of file
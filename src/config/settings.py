@@ -1,51 +1,98 @@
 import os
 import sys
+import functools
 from dotenv import load_dotenv
 
-load_dotenv()
+# Deployed containers get their environment from the orchestrator; only parse
+# .env files outside production
+APP_ENV = os.environ.get('APP_ENV', 'development')
+if APP_ENV != 'production':
+    load_dotenv()
+
+# Snapshot the environment once; every setting below reads from this dict
+_ENV = dict(os.environ)
+
+REQUIRED_ENV_VARS = {
+    'DISCORD_BOT_TOKEN': 'Discord bot token is required',
+    'TARGET_SERVER_ID': 'Target Discord server ID is required',
+    'BIGQUERY_PROJECT_ID': 'BigQuery project ID is required'
+}
 
 def validate_required_env_vars():
     """Validate that all required environment variables are set."""
-    required_vars = {
-        'DISCORD_BOT_TOKEN': 'Discord bot token is required',
-        'TARGET_SERVER_ID': 'Target Discord server ID is required',
-        'BIGQUERY_PROJECT_ID': 'BigQuery project ID is required'
-    }
+    # Common case: everything is set, nothing to build or print
+    if all(_ENV.get(var) for var in REQUIRED_ENV_VARS):
+        return
     
-    missing_vars = []
-    for var, description in required_vars.items():
-        if not os.getenv(var):
-            missing_vars.append(f"  - {var}: {description}")
-    
-    if missing_vars:
-        print("❌ Missing required environment variables:")
-        print("\n".join(missing_vars))
-        print("\n💡 Please check your .env file or environment configuration.")
-        sys.exit(1)
+    missing_vars = [
+        f"  - {var}: {description}"
+        for var, description in REQUIRED_ENV_VARS.items()
+        if not _ENV.get(var)
+    ]
+    print("❌ Missing required environment variables:")
+    print("\n".join(missing_vars))
+    print("\n💡 Please check your .env file or environment configuration.")
+    sys.exit(1)
 
 # Validate before loading
 validate_required_env_vars()
 
 # Bot Configuration
-BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
-TARGET_SERVER_ID = int(os.getenv('TARGET_SERVER_ID'))
+BOT_TOKEN = _ENV.get('DISCORD_BOT_TOKEN')
+TARGET_SERVER_ID = int(_ENV.get('TARGET_SERVER_ID'))
 
 # BigQuery Configuration  
-PROJECT_ID = os.getenv('BIGQUERY_PROJECT_ID')
-DATASET_ID = os.getenv('BIGQUERY_DATASET_ID', 'discord_data')
+PROJECT_ID = _ENV.get('BIGQUERY_PROJECT_ID')
+DATASET_ID = _ENV.get('BIGQUERY_DATASET_ID', 'discord_data')
 
 # Service Account Configuration
-SERVICE_ACCOUNT_PATH = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+SERVICE_ACCOUNT_PATH = _ENV.get('GOOGLE_APPLICATION_CREDENTIALS')
 
 # Task Intervals (in minutes/hours)
-MEMBER_UPDATE_INTERVAL = int(os.getenv('MEMBER_UPDATE_INTERVAL', '60'))
-MESSAGE_UPDATE_INTERVAL = int(os.getenv('MESSAGE_UPDATE_INTERVAL', '60'))
-VOICE_UPDATE_INTERVAL = int(os.getenv('VOICE_UPDATE_INTERVAL', '60'))
-THREAD_UPDATE_INTERVAL = int(os.getenv('THREAD_UPDATE_INTERVAL', '60'))  
-PRESENCE_UPDATE_INTERVAL = int(os.getenv('PRESENCE_UPDATE_INTERVAL', '1440'))  # 24 hours
+MEMBER_UPDATE_INTERVAL = int(_ENV.get('MEMBER_UPDATE_INTERVAL', '60'))
+MESSAGE_UPDATE_INTERVAL = int(_ENV.get('MESSAGE_UPDATE_INTERVAL', '60'))
+VOICE_UPDATE_INTERVAL = int(_ENV.get('VOICE_UPDATE_INTERVAL', '60'))
+THREAD_UPDATE_INTERVAL = int(_ENV.get('THREAD_UPDATE_INTERVAL', '60'))  
+PRESENCE_UPDATE_INTERVAL = int(_ENV.get('PRESENCE_UPDATE_INTERVAL', '1440'))  # 24 hours
+
+# Presence tracking needs the privileged presence intent (Optional)
+ENABLE_PRESENCE_TRACKING = _ENV.get('ENABLE_PRESENCE_TRACKING', 'true').lower() == 'true'
+
+# Append batches up to this many rows are loaded as newline-delimited JSON,
+# skipping the Parquet conversion that dominates small loads
+JSON_LOAD_MAX_ROWS = int(_ENV.get('JSON_LOAD_MAX_ROWS', '1000'))
+
+# Aggregated batches (message counts, voice time) up to this many rows are merged
+# straight from a query parameter instead of going through a staging table
+INLINE_MERGE_MAX_ROWS = int(_ENV.get('INLINE_MERGE_MAX_ROWS', '500'))
+
+# Maximum number of BigQuery calls running at once on the worker threads
+BIGQUERY_MAX_CONCURRENCY = int(_ENV.get('BIGQUERY_MAX_CONCURRENCY', '8'))
+
+# Buffers holding at least this many rows are flushed early, without waiting for their interval;
+# keeps each load job and MERGE around 10k rows instead of one huge batch per interval
+FLUSH_HIGH_WATER_MARK = int(_ENV.get('FLUSH_HIGH_WATER_MARK', '10000'))
+
+# Hard cap on rows held per event stream; new rows are dropped (with a warning)
+# while a buffer is full, e.g. during a long BigQuery outage (ring buffers round
+# this up to a power of two)
+BUFFER_MAX_ROWS = int(_ENV.get('BUFFER_MAX_ROWS', '131072'))
+
+# Message details are streamed to BigQuery in batches of up to this many rows,
+# or whatever arrived within the max wait (seconds). Each batch is one load job,
+# and load jobs are limited to 1500 per table per day, so batches start at least
+# the min interval (seconds) apart even when they fill up faster (60s: 1440 a day)
+MESSAGE_BATCH_SIZE = int(_ENV.get('MESSAGE_BATCH_SIZE', '10000'))
+MESSAGE_BATCH_MAX_WAIT = int(_ENV.get('MESSAGE_BATCH_MAX_WAIT', '120'))
+MESSAGE_BATCH_MIN_INTERVAL = int(_ENV.get('MESSAGE_BATCH_MIN_INTERVAL', '60'))
+
+# Uploads failing with transient BigQuery errors are retried with exponential backoff;
+# rows that still can't be uploaded are saved as parquet files in the dead-letter directory
+UPLOAD_MAX_ATTEMPTS = int(_ENV.get('UPLOAD_MAX_ATTEMPTS', '6'))
+DEAD_LETTER_DIR = _ENV.get('DEAD_LETTER_DIR', 'dlq')
 
 # Table prefix for environment separation (Optional)
-TABLE_PREFIX = os.getenv('BIGQUERY_TABLE_PREFIX', '')
+TABLE_PREFIX = _ENV.get('BIGQUERY_TABLE_PREFIX', '')
 
 # Default table names
 DEFAULT_TABLES = {
@@ -57,6 +104,7 @@ DEFAULT_TABLES = {
     'presence_logs': 'daily_user_logins'
 }
 
+@functools.lru_cache(maxsize=None)
 def get_table_name(table_key: str) -> str:
     """Get table name with optional environment prefix."""
     base_name = DEFAULT_TABLES[table_key]
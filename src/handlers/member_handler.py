@@ -1,33 +1,36 @@
 import discord
-from datetime import datetime, timezone
 from config.settings import TARGET_SERVER_ID
 from config.logging_config import BotLogger
-from utils.helpers import format_roles
+from utils.helpers import role_names, snowflake_str, utc_now
+from .rows import MemberRow, MemberUpdateRow
 
 class MemberHandler:
     """Handler for Discord member events."""
     
+    __slots__ = ('data_buffer', '_target', 'logger')
+    
     def __init__(self, data_buffer):
         self.data_buffer = data_buffer
+        self._target = TARGET_SERVER_ID
         self.logger = BotLogger(__name__)
     
     async def on_member_join(self, member: discord.Member):
         """Handle member join events."""
-        if member.guild.id != TARGET_SERVER_ID:
+        if member.guild.id != self._target:
             return
         
         try:
-            member_data = {
-                'user_id': str(member.id),
-                'user_name': member.name,
-                'display_name': member.display_name or member.name,
-                'is_bot': member.bot,
-                'is_booster': member.premium_since is not None,
-                'role': format_roles(member.roles),
-                'joined_at': member.joined_at or datetime.now(timezone.utc),
-                'status': str(member.status),
-                'updated_at': datetime.now(timezone.utc)
-            }
+            member_data = MemberRow(
+                user_id=snowflake_str(member.id),
+                user_name=member.name,
+                display_name=member.display_name or member.name,
+                is_bot=member.bot,
+                is_booster=member.premium_since is not None,
+                role=role_names(member.roles),
+                joined_at=member.joined_at or utc_now(),
+                status=member.status.value,
+                updated_at=utc_now()
+            )
             
             await self.data_buffer.add_member(member_data)
             
@@ -40,17 +43,17 @@ class MemberHandler:
     
     async def on_member_remove(self, member: discord.Member):
         """Handle member leave events."""
-        if member.guild.id != TARGET_SERVER_ID:
+        if member.guild.id != self._target:
             return
         
         try:
             # Update member status to offline/left
-            update_data = {
-                'user_id': str(member.id),
-                'column': 'status',
-                'new_value': 'left',
-                'updated_at': datetime.now(timezone.utc)
-            }
+            update_data = MemberUpdateRow(
+                user_id=snowflake_str(member.id),
+                column='status',
+                new_value='left',
+                updated_at=utc_now()
+            )
             
             await self.data_buffer.add_member_update(update_data)
             
@@ -62,22 +65,25 @@ class MemberHandler:
     
     async def on_user_update(self, before: discord.User, after: discord.User):
         """Handle user profile updates."""
+        # Most user updates are avatar or other profile changes; only name changes are stored
+        if before.name == after.name:
+            return
+        
         try:
-            if before.name != after.name:
-                update_data = {
-                    'user_id': str(after.id),
-                    'column': 'user_name',
-                    'new_value': after.name,
-                    'updated_at': datetime.now(timezone.utc)
-                }
-                await self.data_buffer.add_member_update(update_data)
-                
-                # Log the name change
-                self.logger.user_activity(
-                    "changed name", 
-                    str(after.id), 
-                    f"from '{before.name}' to '{after.name}'"
-                )
+            update_data = MemberUpdateRow(
+                user_id=snowflake_str(after.id),
+                column='user_name',
+                new_value=after.name,
+                updated_at=utc_now()
+            )
+            await self.data_buffer.add_member_update(update_data)
+            
+            # Log the name change
+            self.logger.user_activity(
+                "changed name", 
+                str(after.id), 
+                f"from '{before.name}' to '{after.name}'"
+            )
             
         except Exception as e:
             self.logger.error(f"process user update for {after.name}", e, f"user {after.id}")
\ No newline at end of file
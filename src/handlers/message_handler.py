@@ -1,103 +1,101 @@
 import discord
-from datetime import datetime, timezone
+import logging
 from config.settings import TARGET_SERVER_ID
 from config.logging_config import BotLogger
+from utils.channel_cache import ChannelCache
+from utils.helpers import snowflake_str
+from .rows import MessageCountRow
 
 class MessageHandler:
     """Handler for Discord message events."""
     
-    def __init__(self, data_buffer):
+    __slots__ = ('data_buffer', '_target', 'channel_cache', 'logger')
+    
+    def __init__(self, data_buffer, channel_cache=None):
         self.data_buffer = data_buffer
+        self._target = TARGET_SERVER_ID
+        self.channel_cache = channel_cache if channel_cache is not None else ChannelCache()
         self.logger = BotLogger(__name__)
     
-    def _is_valid_message_content(self, content: str) -> bool:
-        """
-        Check if message content is valid for processing.
-        
-        Args:
-            content: Message content string
-            
-        Returns:
-            bool: True if content is valid, False otherwise
-        """
-        if content is None:
-            return False
-        
-        # Remove whitespace and check if empty
-        cleaned_content = content.strip()
-        if not cleaned_content:
-            return False
-        
-        # Optional: Add more filters here if needed
-        # For example, filter out messages with only special characters:
-        # if cleaned_content in ['', '​', '\u200b', '\u200c', '\u200d']:  # Zero-width characters
-        #     return False
-        
-        return True
-    
     async def on_message(self, message: discord.Message):
         """Handle message creation events."""
         # Filter by target server
-        if not message.guild or message.guild.id != TARGET_SERVER_ID:
+        guild = message.guild
+        if guild is None or guild.id != self._target:
             return
         
         # Skip bot messages
         if message.author.bot:
             return
         
-        # NOVO: Skip messages with empty or null content
-        if not self._is_valid_message_content(message.content):
+        # NOVO: Skip messages with empty or null content (isspace() rejects without building a copy)
+        content = message.content
+        if not content or content.isspace():
             self.logger.logger.debug(
-                f"⚠️ Skipped empty/null message from user {message.author.id} "
-                f"in channel {getattr(message.channel, 'name', 'Unknown')}"
+                "⚠️ Skipped empty/null message from user %s in channel %s",
+                message.author.id, getattr(message.channel, 'name', 'Unknown')
             )
             return
         
         try:
-            await self._process_message_count(message)
-            await self._process_message_details(message)
+            # Stripped once here and reused for the details row
+            await self._process_message(message, content.strip())
             
-            # Log user activity (debug level)
-            channel_name = getattr(message.channel, 'name', 'DM')
-            self.logger.user_activity(
-                "sent message", 
-                str(message.author.id), 
-                f"in #{channel_name}"
-            )
+            # Log user activity (debug level; skip building the details when it's off)
+            if self.logger.logger.isEnabledFor(logging.DEBUG):
+                channel_name = getattr(message.channel, 'name', 'DM')
+                self.logger.user_activity(
+                    "sent message", 
+                    str(message.author.id), 
+                    f"in #{channel_name}"
+                )
             
         except Exception as e:
             self.logger.error(f"process message {message.id}", e, f"user {message.author.id}")
     
-    async def _process_message_count(self, message: discord.Message):
-        """Process message for counting purposes."""
-        channel_id, _ = self._get_channel_info(message)
-        
-        message_data = {
-            'date': message.created_at.date(),
-            'user_id': str(message.author.id),
-            'channel_id': channel_id
-        }
-        
-        await self.data_buffer.add_message_count(message_data)
-    
-    async def _process_message_details(self, message: discord.Message):
-        """Process detailed message information."""
+    async def _process_message(self, message: discord.Message, content: str):
+        """Buffer the message for both the daily counts and the message details."""
+        # Resolve the shared fields once for both buffers
         channel_id, thread_id = self._get_channel_info(message)
+        user_id = snowflake_str(message.author.id)
+        created_at = message.created_at
         
-        message_data = {
-            'message_id': str(message.id),
-            'created_at': message.created_at,
-            'user_id': str(message.author.id),
-            'channel_id': channel_id,
-            'thread_id': thread_id,
-            'message_content': message.content.strip()  # Garante que não há espaços extras
-        }
+        # Counting is a synchronous dict increment: no await per message
+        self.data_buffer.add_message_count(MessageCountRow(created_at.date(), user_id, channel_id))
         
-        await self.data_buffer.add_message_detail(message_data)
+        # Column order: message_id, created_at, user_id, channel_id, thread_id, message_content
+        await self.data_buffer.add_message_detail(
+            str(message.id),
+            created_at,
+            user_id,
+            channel_id,
+            thread_id,
+            content  # Já sem espaços extras
+        )
     
     def _get_channel_info(self, message: discord.Message) -> tuple[str, str]:
         """Extract channel and thread information from message."""
-        if message.channel.type.name in ["public_thread", "private_thread", "news_thread"]:
-            return str(message.channel.parent_id), str(message.channel.id)
+        channel_info = self.channel_cache.get(message.channel.id)
+        if channel_info is not None:
+            return channel_info
+        
+        return self._cache_channel_info(message.channel)
+    
+    def _cache_channel_info(self, channel) -> tuple[str, str]:
+        """Resolve (channel_id, thread_id) for a channel or thread and cache it."""
+        # Thread messages are attributed to their parent channel
+        if type(channel) is discord.Thread:
+            channel_info = (str(channel.parent_id), str(channel.id))
         else:
-            return str(message.channel.id), ""
\ No newline at end of file
+            channel_info = (str(channel.id), "")
+        
+        self.channel_cache.set(channel.id, channel_info)
+        return channel_info
+    
+    def warm_channel_cache(self, guild: discord.Guild):
+        """Pre-populate the channel cache from the guild's gateway state so first messages hit the cache."""
+        if guild.id != self._target:
+            return
+        
+        for channel in [*guild.text_channels, *guild.voice_channels, *guild.threads]:
+            self._cache_channel_info(channel)
\ No newline at end of file
@@ -1,48 +1,61 @@
 import discord
-from datetime import datetime, timezone
+import logging
 from config.settings import TARGET_SERVER_ID
 from config.logging_config import BotLogger
+from utils.helpers import snowflake_str, utc_now
+from .rows import PresenceRow
+
+# Statuses that count as being online for login detection
+ACTIVE_STATUSES = frozenset({discord.Status.online, discord.Status.idle, discord.Status.dnd})
 
 class PresenceHandler:
     """Handler for Discord presence events."""
     
+    __slots__ = ('data_buffer', '_target', 'logger')
+    
     def __init__(self, data_buffer):
         self.data_buffer = data_buffer
+        self._target = TARGET_SERVER_ID
         self.logger = BotLogger(__name__)
     
     async def on_presence_update(self, before: discord.Member, after: discord.Member):
         """Handle presence status changes to detect daily logins."""
         # Filter by target server
-        if after.guild.id != TARGET_SERVER_ID:
+        if after.guild.id != self._target:
+            return
+        
+        # Activity-only updates (games, custom status) are the bulk of presence events
+        if before.status is after.status:
             return
         
         try:
             # Detect transition from offline to ANY active status
             # This captures real logins regardless of initial status (online, idle, dnd)
-            was_offline = before.status == discord.Status.offline
-            is_now_active = after.status in [
-                discord.Status.online,
-                discord.Status.idle,
-                discord.Status.dnd
-            ]
-            
-            if was_offline and is_now_active:
-                presence_data = {
-                    'logged_at': datetime.now(timezone.utc),  
-                    'user_id': str(after.id),
-                    'user_name': after.name
-                }
+            if before.status is discord.Status.offline and after.status in ACTIVE_STATUSES:
+                user_id = snowflake_str(after.id)
                 
-                await self.data_buffer.add_presence_log(presence_data)
+                # The buffer keeps only the first login per user until the next flush;
+                # skip building rows it would refuse anyway
+                if self.data_buffer.presence_logged(user_id):
+                    return
                 
-                self.logger.user_activity(
-                    "logged in", 
-                    str(after.id),
-                    f"status: {after.status}"
+                presence_data = PresenceRow(
+                    logged_at=utc_now(),
+                    user_id=user_id,
+                    user_name=after.name
                 )
+                
+                await self.data_buffer.add_presence_log(presence_data)
+                
+                if self.logger.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.user_activity(
+                        "logged in", 
+                        str(after.id),
+                        f"status: {after.status}"
+                    )
             
             # Log other status changes at debug level for monitoring
-            elif before.status != after.status:
+            elif before.status != after.status and self.logger.logger.isEnabledFor(logging.DEBUG):
                 self.logger.user_activity(
                     "status changed", 
                     str(after.id), 
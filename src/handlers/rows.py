@@ -0,0 +1,45 @@
+from datetime import date, datetime
+from typing import NamedTuple, Tuple
+
+# Buffered row types. Tuples are much smaller than one dict per row, and
+# pandas takes the column names straight from the fields when uploading.
+
+class MemberRow(NamedTuple):
+    user_id: str
+    user_name: str
+    display_name: str
+    is_bot: bool
+    is_booster: bool
+    role: Tuple[str, ...]  # role names, joined at upload
+    joined_at: datetime
+    status: str
+    updated_at: datetime
+
+class MemberUpdateRow(NamedTuple):
+    user_id: str
+    column: str
+    new_value: str
+    updated_at: datetime
+
+class MessageCountRow(NamedTuple):
+    date: date
+    user_id: str
+    channel_id: str
+
+class VoiceRow(NamedTuple):
+    date: date
+    user_id: str
+    channel_id: str
+    duration_seconds: int
+
+class ThreadRow(NamedTuple):
+    created_at: datetime
+    user_id: str
+    thread_name: str
+    channel_id: str
+    thread_id: str
+
+class PresenceRow(NamedTuple):
+    logged_at: datetime
+    user_id: str
+    user_name: str
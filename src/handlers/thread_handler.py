@@ -1,10 +1,14 @@
 import discord
 from datetime import datetime
 from config.logging_config import BotLogger
+from utils.helpers import snowflake_str
+from .rows import ThreadRow
 
 class ThreadHandler:
     """Handler for Discord thread events."""
     
+    __slots__ = ('data_buffer', 'logger')
+    
     def __init__(self, data_buffer):
         self.data_buffer = data_buffer
         self.logger = BotLogger(__name__)
@@ -14,13 +18,13 @@ class ThreadHandler:
         try:
             created_at = thread.created_at or datetime.utcnow()
             
-            thread_data = {
-                'created_at': created_at,
-                'user_id': str(thread.owner_id),
-                'thread_name': thread.name,
-                'channel_id': str(thread.parent_id),
-                'thread_id': str(thread.id)
-            }
+            thread_data = ThreadRow(
+                created_at=created_at,
+                user_id=snowflake_str(thread.owner_id),
+                thread_name=thread.name,
+                channel_id=snowflake_str(thread.parent_id),
+                thread_id=str(thread.id)
+            )
             
             await self.data_buffer.add_thread(thread_data)
             
@@ -1,25 +1,39 @@
 import discord
-from datetime import datetime, timezone
+import logging
+import time
+from datetime import date
+from typing import NamedTuple
 from config.settings import TARGET_SERVER_ID
 from config.logging_config import BotLogger
-from utils.helpers import format_duration
+from utils.helpers import format_duration, snowflake_str, utc_now
+from .rows import VoiceRow
+
+class VoiceEntry(NamedTuple):
+    """Where and when a user joined voice, kept until they leave."""
+    channel_id: str
+    entry_date: date
+    started: float  # time.monotonic() at join; durations never need datetime arithmetic
 
 class VoiceHandler:
     """Handler for Discord voice state events."""
     
+    __slots__ = ('data_buffer', '_target', 'voice_entry_times', 'logger')
+    
     def __init__(self, data_buffer):
         self.data_buffer = data_buffer
+        self._target = TARGET_SERVER_ID
         self.voice_entry_times = {}
         self.logger = BotLogger(__name__)
     
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         """Handle voice state updates."""
         # Filter by target server
-        if not member.guild or member.guild.id != TARGET_SERVER_ID:
+        guild = member.guild
+        if guild is None or guild.id != self._target:
             return
         
         try:
-            user_id = str(member.id)
+            user_id = snowflake_str(member.id)
             
             # User joins a voice channel
             if before.channel is None and after.channel is not None:
@@ -35,44 +49,42 @@ class VoiceHandler:
                 await self._handle_voice_join(user_id, member.display_name, after.channel)
                 
                 # Log channel switch
-                self.logger.user_activity(
-                    "switched voice channels", 
-                    user_id, 
-                    f"from '{before.channel.name}' to '{after.channel.name}'"
-                )
+                if self.logger.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.user_activity(
+                        "switched voice channels", 
+                        user_id, 
+                        f"from '{before.channel.name}' to '{after.channel.name}'"
+                    )
                 
         except Exception as e:
             self.logger.error(f"process voice state update for {member.display_name}", e, f"user {member.id}")
     
     async def _handle_voice_join(self, user_id: str, display_name: str, channel: discord.VoiceChannel):
         """Handle user joining voice channel."""
-        entry_time = datetime.now(timezone.utc)
-        self.voice_entry_times[user_id] = (str(channel.id), entry_time)
+        # Channel id strings are shared across joins through the snowflake cache
+        self.voice_entry_times[user_id] = VoiceEntry(snowflake_str(channel.id), utc_now().date(), time.monotonic())
         
-        self.logger.user_activity("joined voice channel", user_id, f"'{channel.name}'")
+        if self.logger.logger.isEnabledFor(logging.DEBUG):
+            self.logger.user_activity("joined voice channel", user_id, f"'{channel.name}'")
     
     async def _handle_voice_leave(self, user_id: str, display_name: str, channel: discord.VoiceChannel):
         """Handle user leaving voice channel."""
-        if user_id not in self.voice_entry_times:
+        entry = self.voice_entry_times.pop(user_id, None)
+        if entry is None:
             return
         
-        channel_id, entry_time = self.voice_entry_times.pop(user_id)
-        exit_time = datetime.now(timezone.utc)
-        duration = int((exit_time - entry_time).total_seconds())
+        channel_id, entry_date, started = entry
+        duration = int(time.monotonic() - started)
         
-        voice_data = {
-            'date': entry_time.date(),
-            'user_id': user_id,
-            'channel_id': channel_id,
-            'duration_seconds': duration
-        }
+        voice_data = VoiceRow(entry_date, user_id, channel_id, duration)
         
         await self.data_buffer.add_voice_activity(voice_data)
         
-        # Log with human-readable duration
-        duration_str = format_duration(duration)
-        self.logger.user_activity(
-            "left voice channel", 
-            user_id, 
-            f"'{channel.name}' after {duration_str}"
-        )
\ No newline at end of file
+        # Log with human-readable duration (only worth formatting when DEBUG is on)
+        if self.logger.logger.isEnabledFor(logging.DEBUG):
+            duration_str = format_duration(duration)
+            self.logger.user_activity(
+                "left voice channel", 
+                user_id, 
+                f"'{channel.name}' after {duration_str}"
+            )
\ No newline at end of file
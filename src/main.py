@@ -2,7 +2,7 @@ import asyncio
 import os
 from bot import DiscordAnalyticsBot
 from config.settings import BOT_TOKEN
-from config.logging_config import setup_logging, BotLogger
+from config.logging_config import setup_logging, stop_logging, BotLogger
 
 async def main():
     """Main entry point for the Discord Analytics Bot."""
@@ -12,6 +12,12 @@ async def main():
     use_colors = os.getenv('LOG_COLORS', 'true').lower() == 'true'
     setup_logging(level=log_level, use_colors=use_colors)
     
+    # Python 3.12+: run new tasks eagerly until their first await, so event handlers
+    # that return early (other guilds, unchanged statuses) finish without a loop round trip
+    eager_task_factory = getattr(asyncio, 'eager_task_factory', None)
+    if eager_task_factory is not None:
+        asyncio.get_running_loop().set_task_factory(eager_task_factory)
+    
     # Create main logger
     logger = BotLogger(__name__)
     
@@ -31,6 +37,20 @@ async def main():
             logger.logger.info("🔄 Cleaning up and shutting down...")
             await bot.close()
         logger.logger.info("👋 Discord Analytics Bot stopped")
+        stop_logging()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop (winloop on Windows) schedules callbacks and socket I/O noticeably
+    # faster than the default loop; fall back to asyncio when neither is installed
+    try:
+        import uvloop as fast_loop
+    except ImportError:
+        try:
+            import winloop as fast_loop
+        except ImportError:
+            fast_loop = None
+    
+    if fast_loop is not None:
+        fast_loop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -4,12 +4,18 @@ Services module for Discord Analytics Bot.
 This module contains services for data management and external integrations:
 - BigQueryService: Handles all BigQuery operations and data uploads
 - DataBuffer: Thread-safe data buffering before BigQuery uploads
+- RingBuffer: Fixed-capacity row buffer backing the DataBuffer event streams
+- ColumnarBuffer: Column-wise row buffer for the message details stream
 """
 
 from .bigquery_service import BigQueryService
 from .data_buffer import DataBuffer
+from .ring_buffer import RingBuffer
+from .columnar_buffer import ColumnarBuffer
 
 __all__ = [
     'BigQueryService',
-    'DataBuffer'
+    'DataBuffer',
+    'RingBuffer',
+    'ColumnarBuffer'
 ]
\ No newline at end of file
@@ -1,10 +1,56 @@
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+import pyarrow as pa
+import pyarrow.parquet as pq
+import asyncio
+import functools
+import io
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Union
+from google.api_core.exceptions import Forbidden, NotFound, RetryError, ServerError, TooManyRequests
 from google.cloud import bigquery
-from config.bigquery_config import get_bigquery_client, SCHEMAS
-from config.settings import PROJECT_ID, DATASET_ID, get_table_name
+from config.bigquery_config import get_bigquery_client, SCHEMAS, MEMBER_STAGING_SCHEMA
+from config.settings import (
+    PROJECT_ID,
+    DATASET_ID,
+    JSON_LOAD_MAX_ROWS,
+    INLINE_MERGE_MAX_ROWS,
+    BIGQUERY_MAX_CONCURRENCY,
+    DEFAULT_TABLES,
+    get_table_name
+)
 from config.logging_config import BotLogger
-from utils.helpers import format_count
+from utils.helpers import elapsed_minutes_seconds, format_count
+
+# Member columns that buffered field updates may change
+MEMBER_UPDATE_COLUMNS = frozenset({'user_name', 'display_name', 'status', 'role', 'is_booster'})
+
+# Errors worth retrying: 5xx, 429 and exhausted client-side retries
+TRANSIENT_ERRORS = (ServerError, TooManyRequests, RetryError)
+
+# BigQuery reports rate limits and quotas as 403s; any other 403 is a real permission error
+RETRYABLE_FORBIDDEN_REASONS = frozenset({'rateLimitExceeded', 'quotaExceeded'})
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed BigQuery call is worth retrying."""
+    if isinstance(error, Forbidden):
+        return any(detail.get('reason') in RETRYABLE_FORBIDDEN_REASONS for detail in error.errors)
+    return isinstance(error, TRANSIENT_ERRORS)
+
+# Staging tables expire on their own if a flush dies between the load and the MERGE
+STAGING_TABLE_TTL = timedelta(hours=6)
+
+# Arrow types for the BigQuery column types used in SCHEMAS
+ARROW_TYPES = {
+    'STRING': pa.string(),
+    'INTEGER': pa.int64(),
+    'BOOLEAN': pa.bool_(),
+    'DATE': pa.date32(),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+}
 
 class BigQueryService:
     """Service for handling BigQuery operations."""
@@ -14,17 +60,127 @@ class BigQueryService:
         self.project_id = PROJECT_ID
         self.dataset_id = DATASET_ID
         self.logger = BotLogger(__name__)
+        
+        # Fully qualified table ids never change at runtime: build them once
+        self._table_ids = {
+            table_key: f"{self.project_id}.{self.dataset_id}.{get_table_name(table_key)}"
+            for table_key in DEFAULT_TABLES
+        }
+        
+        # Load job configs are reused for every load (the client copies them per job)
+        append = bigquery.WriteDisposition.WRITE_APPEND
+        truncate = bigquery.WriteDisposition.WRITE_TRUNCATE
+        self._append_configs = {
+            table_key: bigquery.LoadJobConfig(schema=schema, write_disposition=append)
+            for table_key, schema in SCHEMAS.items()
+        }
+        self._json_append_configs = {
+            table_key: bigquery.LoadJobConfig(
+                schema=schema,
+                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                write_disposition=append
+            )
+            for table_key, schema in SCHEMAS.items()
+        }
+        self._parquet_append_configs = {
+            table_key: bigquery.LoadJobConfig(
+                schema=schema,
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition=append
+            )
+            for table_key, schema in SCHEMAS.items()
+        }
+        self._arrow_schemas = {
+            table_key: pa.schema([(field.name, ARROW_TYPES[field.field_type]) for field in schema])
+            for table_key, schema in SCHEMAS.items()
+        }
+        self._staging_configs = {
+            table_key: bigquery.LoadJobConfig(schema=schema, write_disposition=truncate)
+            for table_key, schema in SCHEMAS.items()
+        }
+        self._staging_configs['members'] = bigquery.LoadJobConfig(schema=MEMBER_STAGING_SCHEMA, write_disposition=truncate)
+        
+        # The BigQuery client is synchronous: run its calls on a dedicated,
+        # bounded pool so they never block the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=BIGQUERY_MAX_CONCURRENCY,
+            thread_name_prefix='bq'
+        )
+        self._semaphore = asyncio.Semaphore(BIGQUERY_MAX_CONCURRENCY)
+    
+    def close(self):
+        """Release the BigQuery worker threads."""
+        self._executor.shutdown(wait=False)
     
     def _get_table_id(self, table_key: str) -> str:
         """Get full table ID with optional prefix."""
-        table_name = get_table_name(table_key)
-        return f"{self.project_id}.{self.dataset_id}.{table_name}"
+        return self._table_ids[table_key]
+    
+    @staticmethod
+    def _temp_table_id(table_id: str, label: str = "temp") -> str:
+        """Unique staging table id, so concurrent or overlapping flushes never share a temp table."""
+        return f"{table_id}_{label}_{uuid.uuid4().hex}"
+    
+    async def _to_dataframe(self, rows: Union[List[Any], Dict[str, List[Any]], pd.DataFrame]) -> pd.DataFrame:
+        """Build a DataFrame from buffered rows or columns on the worker pool; DataFrames are passed through as-is."""
+        if isinstance(rows, pd.DataFrame):
+            return rows
+        # Walking tens of thousands of rows takes long enough to stall the event loop.
+        # pd.DataFrame (unlike from_records) names the columns after NamedTuple row fields
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, pd.DataFrame, rows)
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a blocking BigQuery client call on the service's thread pool."""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    async def _run_job(self, submit, *args, **kwargs):
+        """Submit a BigQuery job and wait for its result without blocking the event loop."""
+        return await self._run_blocking(lambda: submit(*args, **kwargs).result())
+    
+    async def _append_dataframe(self, df: pd.DataFrame, table_key: str):
+        """Append rows with a load job: newline-delimited JSON for small batches, Parquet for large ones."""
+        table_id = self._get_table_id(table_key)
+        
+        if len(df) > JSON_LOAD_MAX_ROWS:
+            job_config = self._append_configs[table_key]
+            await self._run_job_once(self.client.load_table_from_dataframe, df, table_id, job_config=job_config)
+            return
+        
+        # Small batches: pyarrow's Parquet conversion costs more than the payload itself
+        job_config = self._json_append_configs[table_key]
+        await self._run_job_once(
+            lambda job_id: self.client.load_table_from_file(self._to_ndjson(df), table_id, job_config=job_config, job_id=job_id)
+        )
+    
+    async def _append_columns(self, columns: Dict[str, List[Any]], table_key: str):
+        """Append a large column batch as Parquet built straight from the columns, without pandas."""
+        table_id = self._get_table_id(table_key)
+        job_config = self._parquet_append_configs[table_key]
+        await self._run_job_once(
+            lambda job_id: self.client.load_table_from_file(
+                self._to_parquet(columns, table_key), table_id, job_config=job_config, job_id=job_id
+            )
+        )
     
-    def _log_execution_time(self, operation: str, start_time: float, records_count: int, table_name: str):
+    def _to_parquet(self, columns: Dict[str, List[Any]], table_key: str) -> io.BytesIO:
+        """Serialize buffered columns as Parquet using the table's Arrow schema."""
+        parquet = io.BytesIO()
+        pq.write_table(pa.Table.from_pydict(columns, schema=self._arrow_schemas[table_key]), parquet)
+        parquet.seek(0)
+        return parquet
+    
+    @staticmethod
+    def _to_ndjson(df: pd.DataFrame) -> io.BytesIO:
+        """Serialize a DataFrame as newline-delimited JSON with ISO-8601 (microsecond) timestamps."""
+        ndjson = df.to_json(orient='records', lines=True, date_format='iso', date_unit='us')
+        return io.BytesIO(ndjson.encode('utf-8'))
+    
+    def _log_execution_time(self, operation: str, start_time: int, records_count: int, table_name: str):
         """Log execution time with detailed information."""
-        duration = time.time() - start_time
-        minutes = int(duration // 60)
-        seconds = int(duration % 60)
+        minutes, seconds = elapsed_minutes_seconds(start_time)
         
         if minutes > 0:
             time_str = f"{minutes}m {seconds}s"
@@ -35,20 +191,19 @@ class BigQueryService:
         
         self.logger.logger.info(f"📊 {operation} completed: {record_str} loaded to '{table_name}' in {time_str}")
     
-    async def update_members(self, members_df: pd.DataFrame, updates_df: pd.DataFrame):
+    async def update_members(self, members: List[tuple], updates: List[tuple]):
         """Update member data in BigQuery."""
-        start_time = time.time()
-        total_records = 0
+        start_time = time.perf_counter_ns()
+        members_df = await self._to_dataframe(members)
+        updates_df = await self._to_dataframe(updates)
         
         try:
-            if not members_df.empty:
-                await self._upsert_members(members_df)
-                total_records += len(members_df)
-            
-            if not updates_df.empty:
-                await self._update_member_fields(updates_df)
-                total_records += len(updates_df)
+            # Joins and field updates go out together: one staging load and one MERGE
+            staged_df = self._combine_member_changes(members_df, updates_df)
+            if not staged_df.empty:
+                await self._bulk_upsert_members(staged_df, self._get_table_id('members'))
             
+            total_records = len(members_df) + len(updates_df)
             if total_records > 0:
                 self._log_execution_time("Member data update", start_time, total_records, get_table_name('members'))
                 
@@ -56,77 +211,81 @@ class BigQueryService:
             self.logger.error("update members", e)
             raise
     
-    async def _upsert_members(self, members_df: pd.DataFrame):
-        """Upsert member data using MERGE statement with safe parameters."""
-        table_id = self._get_table_id('members')
+    def _combine_member_changes(self, members_df: pd.DataFrame, updates_df: pd.DataFrame) -> pd.DataFrame:
+        """Fold buffered joins and field updates into one staging row per user."""
+        columns = [field.name for field in SCHEMAS['members']]
         
-        try:
-            members_df = self._prepare_member_data_safe(members_df)
-            
-            # Process each member with parameterized MERGE query
-            for _, row in members_df.iterrows():
-                job_config = bigquery.QueryJobConfig(
-                    query_parameters=[
-                        bigquery.ScalarQueryParameter("user_id", "STRING", str(row['user_id'])),
-                        bigquery.ScalarQueryParameter("user_name", "STRING", str(row['user_name'])),
-                        bigquery.ScalarQueryParameter("display_name", "STRING", str(row['display_name'])),
-                        bigquery.ScalarQueryParameter("is_bot", "BOOL", bool(row['is_bot'])),
-                        bigquery.ScalarQueryParameter("is_booster", "BOOL", bool(row['is_booster'])),
-                        bigquery.ScalarQueryParameter("role", "STRING", str(row['role'])),
-                        bigquery.ScalarQueryParameter("joined_at", "TIMESTAMP", row['joined_at']),
-                        bigquery.ScalarQueryParameter("status", "STRING", str(row['status'])),
-                        bigquery.ScalarQueryParameter("updated_at", "TIMESTAMP", row['updated_at']),
-                    ]
-                )
-                
-                merge_query = self._build_safe_member_merge_query(table_id)
-                query_job = self.client.query(merge_query, job_config=job_config)
-                query_job.result()
-            
-        except Exception as e:
-            self.logger.error("upsert members", e)
-            raise
+        # Full rows from joins (is_upsert); MERGE rejects several source rows per target row
+        if members_df.empty:
+            upserts = pd.DataFrame(columns=columns).set_index('user_id')
+        else:
+            upserts = (
+                self._prepare_member_data_safe(members_df)
+                .drop_duplicates(subset=['user_id'], keep='last')
+                .set_index('user_id')[columns[1:]]
+            )
+        upserts['is_upsert'] = True
+        
+        if updates_df.empty:
+            return upserts.reset_index()
+        
+        # Validate columns (security whitelist)
+        whitelisted = updates_df['column'].isin(MEMBER_UPDATE_COLUMNS)
+        if not whitelisted.all():
+            skipped = ', '.join(map(str, updates_df.loc[~whitelisted, 'column'].unique()))
+            self.logger.logger.warning(f"⚠️ Skipped {int((~whitelisted).sum())} updates to non-whitelisted columns: {skipped}")
+        
+        # Last change per user and column wins; one column per updated field
+        latest = updates_df[whitelisted].drop_duplicates(subset=['user_id', 'column'], keep='last')
+        values = latest.pivot(index='user_id', columns='column', values='new_value')
+        changed_at = latest.pivot(index='user_id', columns='column', values='updated_at')
+        
+        # A change overrides a join buffered in the same flush unless it is older. Timestamps have
+        # one-second resolution, so a join and a change in the same second keep the change
+        # (updates were always applied after the joins)
+        joined_at = upserts['updated_at'].reindex(values.index)
+        newer = changed_at.ge(joined_at, axis=0) | joined_at.isna().to_numpy()[:, None]
+        values = values.where(newer)
+        last_changed = changed_at.where(newer).max(axis=1)
+        
+        # Users who joined in this flush: apply the later changes to their full row
+        upserts.update(values)
+        later = last_changed.reindex(upserts.index)
+        upserts['updated_at'] = later.where(later.notna(), upserts['updated_at'])
+        
+        # Everyone else gets a partial row: NULL columns keep their current value in the MERGE
+        partial = values[~values.index.isin(upserts.index)].dropna(how='all')
+        if partial.empty:
+            return upserts.reset_index()
+        
+        partial = partial.reindex(columns=columns[1:])
+        partial['updated_at'] = last_changed
+        partial['is_upsert'] = False
+        staged = pd.concat([upserts, partial]).rename_axis('user_id').reset_index()
+        
+        # Partial rows have no join date; keep the column a timestamp for the load
+        staged['joined_at'] = self._as_timestamps(staged['joined_at'])
+        return staged
     
-    async def _update_member_fields(self, updates_df: pd.DataFrame):
-        """Update specific member fields using safe parameters."""
-        table_id = self._get_table_id('members')
+    async def _bulk_upsert_members(self, members_df: pd.DataFrame, table_id: str):
+        """Upsert members by staging them in a temporary table and merging once."""
+        temp_table_id = self._temp_table_id(table_id)
         
         try:
-            processed_count = 0
-            for _, row in updates_df.iterrows():
-                # Validate column (security whitelist)
-                allowed_columns = ['user_name', 'display_name', 'status', 'role', 'is_booster']
-                if row['column'] not in allowed_columns:
-                    self.logger.logger.warning(f"⚠️ Skipped update to non-whitelisted column: {row['column']}")
-                    continue
-                
-                job_config = bigquery.QueryJobConfig(
-                    query_parameters=[
-                        bigquery.ScalarQueryParameter("new_value", "STRING", str(row['new_value'])),
-                        bigquery.ScalarQueryParameter("updated_at", "TIMESTAMP", row['updated_at']),
-                        bigquery.ScalarQueryParameter("user_id", "STRING", str(row['user_id'])),
-                    ]
-                )
-                
-                # Column name can't be parameterized, but was validated above
-                update_query = f"""
-                UPDATE `{table_id}`
-                SET {row['column']} = @new_value,
-                    updated_at = @updated_at
-                WHERE user_id = @user_id
-                """
-                
-                query_job = self.client.query(update_query, job_config=job_config)
-                query_job.result()
-                processed_count += 1
+            await self._load_staging_table(members_df, temp_table_id, self._staging_configs['members'])
             
-        except Exception as e:
-            self.logger.error("update member fields", e)
+            merge_query = self._build_safe_member_merge_query(table_id, source=f"`{temp_table_id}`")
+            await self._merge_and_drop(merge_query, temp_table_id)
+            
+        except Exception:
+            # Clean up temporary table on error
+            await self._run_blocking(self.client.delete_table, temp_table_id, not_found_ok=True)
             raise
     
-    async def update_message_counts(self, message_df: pd.DataFrame):
+    async def update_message_counts(self, rows: Dict[str, List[Any]]):
         """Update message counts using merge operation."""
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
+        message_df = await self._to_dataframe(rows)
         
         try:
             await self._merge_aggregated_data(message_df, 'message_counts', 'message_count')
@@ -136,24 +295,27 @@ class BigQueryService:
             self.logger.error("update message counts", e)
             raise
     
-    async def update_message_details(self, message_df: pd.DataFrame):
+    async def update_message_details(self, rows: Union[List[Dict[str, Any]], Dict[str, List[Any]]]):
         """Update message details by appending to table."""
-        start_time = time.time()
-        table_id = self._get_table_id('message_details')
+        start_time = time.perf_counter_ns()
+        
+        # Large batches come from the columnar buffer: load them as Arrow columns, skipping pandas
+        if isinstance(rows, dict) and len(rows['message_id']) > JSON_LOAD_MAX_ROWS:
+            try:
+                await self._append_columns(rows, 'message_details')
+                self._log_execution_time("Message details update", start_time, len(rows['message_id']), get_table_name('message_details'))
+            except Exception as e:
+                self.logger.error("update message details", e)
+                raise
+            return
+        
+        message_df = await self._to_dataframe(rows)
         
         try:
             # Ensure timestamp format
-            message_df['created_at'] = pd.to_datetime(message_df['created_at'])
-            
-            job_config = bigquery.LoadJobConfig(
-                schema=SCHEMAS['message_details'],
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
-            )
+            message_df['created_at'] = self._as_timestamps(message_df['created_at'])
             
-            job = self.client.load_table_from_dataframe(
-                message_df, table_id, job_config=job_config
-            )
-            job.result()
+            await self._append_dataframe(message_df, 'message_details')
             
             self._log_execution_time("Message details update", start_time, len(message_df), get_table_name('message_details'))
             
@@ -161,9 +323,10 @@ class BigQueryService:
             self.logger.error("update message details", e)
             raise
     
-    async def update_voice_activity(self, voice_df: pd.DataFrame):
+    async def update_voice_activity(self, rows: Dict[str, List[Any]]):
         """Update voice activity using merge operation."""
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
+        voice_df = await self._to_dataframe(rows)
         
         try:
             await self._merge_aggregated_data(voice_df, 'voice_activity', 'duration_seconds')
@@ -173,21 +336,13 @@ class BigQueryService:
             self.logger.error("update voice activity", e)
             raise
     
-    async def update_threads(self, thread_df: pd.DataFrame):
+    async def update_threads(self, rows: List[tuple]):
         """Update thread data by appending to table."""
-        start_time = time.time()
-        table_id = self._get_table_id('threads')
+        start_time = time.perf_counter_ns()
+        thread_df = await self._to_dataframe(rows)
         
         try:
-            job_config = bigquery.LoadJobConfig(
-                schema=SCHEMAS['threads'],
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
-            )
-            
-            job = self.client.load_table_from_dataframe(
-                thread_df, table_id, job_config=job_config
-            )
-            job.result()
+            await self._append_dataframe(thread_df, 'threads')
             
             self._log_execution_time("Thread data update", start_time, len(thread_df), get_table_name('threads'))
             
@@ -195,29 +350,14 @@ class BigQueryService:
             self.logger.error("update threads", e)
             raise
     
-    async def update_presence_logs(self, presence_df: pd.DataFrame):
+    async def update_presence_logs(self, rows: List[tuple]):
         """Update presence logs by appending unique entries."""
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
+        presence_df = await self._to_dataframe(rows)
         
         try:
-            # Remove duplicates by user_id
-            original_count = len(presence_df)
-            presence_df = presence_df.drop_duplicates(subset=['user_id'])
-            
-            if len(presence_df) < original_count:
-                self.logger.logger.debug(f"Removed {original_count - len(presence_df)} duplicate presence records")
-            
-            table_id = self._get_table_id('presence_logs')
-            
-            job_config = bigquery.LoadJobConfig(
-                schema=SCHEMAS['presence_logs'],
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
-            )
-            
-            job = self.client.load_table_from_dataframe(
-                presence_df, table_id, job_config=job_config
-            )
-            job.result()
+            # Rows are already unique per user_id (the buffer is keyed by user)
+            await self._append_dataframe(presence_df, 'presence_logs')
             
             self._log_execution_time("Presence logs update", start_time, len(presence_df), get_table_name('presence_logs'))
             
@@ -228,71 +368,149 @@ class BigQueryService:
     async def _merge_aggregated_data(self, df: pd.DataFrame, table_key: str, aggregate_column: str):
         """Generic method for merging aggregated data."""
         table_id = self._get_table_id(table_key)
-        temp_table_id = f"{table_id}_temp"
+        
+        # Small batches: pass the rows as a query parameter and merge in one job, no staging table
+        if len(df) <= INLINE_MERGE_MAX_ROWS:
+            await self._merge_aggregated_inline(df, table_id, aggregate_column)
+            return
+        
+        temp_table_id = self._temp_table_id(table_id)
         
         try:
-            # Load to temporary table
-            job = self.client.load_table_from_dataframe(df, temp_table_id)
-            job.result()
+            # Load to temporary table with the target schema, so column types are never inferred
+            await self._load_staging_table(df, temp_table_id, self._staging_configs[table_key])
             
             # Merge with main table
-            merge_query = f"""
-            MERGE `{table_id}` T
-            USING `{temp_table_id}` Temp
-            ON T.date = Temp.date AND T.user_id = Temp.user_id AND T.channel_id = Temp.channel_id
-            WHEN MATCHED THEN
-                UPDATE SET T.{aggregate_column} = T.{aggregate_column} + Temp.{aggregate_column}
-            WHEN NOT MATCHED THEN
-                INSERT (date, user_id, channel_id, {aggregate_column})
-                VALUES (Temp.date, Temp.user_id, Temp.channel_id, Temp.{aggregate_column})
-            """
+            merge_query = self._build_aggregate_merge_query(table_id, f"`{temp_table_id}`", aggregate_column)
+            await self._merge_and_drop(merge_query, temp_table_id)
             
-            self.client.query(merge_query).result()
-            
-            # Clean up temporary table
-            self.client.delete_table(temp_table_id, not_found_ok=True)
-            
-        except Exception as e:
+        except Exception:
             # Clean up temporary table on error
-            self.client.delete_table(temp_table_id, not_found_ok=True)
+            await self._run_blocking(self.client.delete_table, temp_table_id, not_found_ok=True)
             raise
     
+    async def _merge_aggregated_inline(self, df: pd.DataFrame, table_id: str, aggregate_column: str):
+        """Merge a small aggregated batch from an ARRAY<STRUCT> query parameter."""
+        columns = ['date', 'user_id', 'channel_id', aggregate_column]
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("date", "DATE", date),
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+                bigquery.ScalarQueryParameter("channel_id", "STRING", channel_id),
+                bigquery.ScalarQueryParameter(aggregate_column, "INT64", int(value)),
+            )
+            for date, user_id, channel_id, value in df[columns].itertuples(index=False, name=None)
+        ]
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("rows", "STRUCT", rows)]
+        )
+        
+        merge_query = self._build_aggregate_merge_query(table_id, "UNNEST(@rows)", aggregate_column)
+        await self._run_job_once(self.client.query, merge_query, job_config=job_config)
+    
+    def _build_aggregate_merge_query(self, table_id: str, source: str, aggregate_column: str) -> str:
+        """MERGE that adds the source's aggregate column onto existing (date, user_id, channel_id) rows."""
+        return f"""
+        MERGE `{table_id}` T
+        USING {source} Temp
+        ON T.date = Temp.date AND T.user_id = Temp.user_id AND T.channel_id = Temp.channel_id
+        WHEN MATCHED THEN
+            UPDATE SET T.{aggregate_column} = T.{aggregate_column} + Temp.{aggregate_column}
+        WHEN NOT MATCHED THEN
+            INSERT (date, user_id, channel_id, {aggregate_column})
+            VALUES (Temp.date, Temp.user_id, Temp.channel_id, Temp.{aggregate_column})
+        """
+    
+    async def _load_staging_table(self, df: pd.DataFrame, temp_table_id: str, job_config: bigquery.LoadJobConfig):
+        """Create a staging table with an expiration time, then load the batch into it."""
+        table = bigquery.Table(temp_table_id, schema=job_config.schema)
+        table.expires = datetime.now(timezone.utc) + STAGING_TABLE_TTL
+        await self._run_blocking(self.client.create_table, table)
+        await self._run_job(self.client.load_table_from_dataframe, df, temp_table_id, job_config=job_config)
+    
+    async def _merge_and_drop(self, merge_query: str, temp_table_id: str):
+        """Run a MERGE from a staging table, then drop the table."""
+        await self._run_job_once(self.client.query, merge_query)
+        
+        # Separate best-effort call: a failed DROP must never make the applied MERGE
+        # look failed (and retried); leftover tables expire after STAGING_TABLE_TTL
+        try:
+            await self._run_blocking(self.client.delete_table, temp_table_id, not_found_ok=True)
+        except Exception as e:
+            self.logger.logger.warning(f"⚠️ Could not drop staging table {temp_table_id}, it expires on its own: {e}")
+    
+    async def _run_job_once(self, submit, *args, **kwargs):
+        """Run a job that must not apply twice (appends, additive MERGEs), settling failures by the job's state so a retry never repeats it."""
+        # Submitting or polling can fail after BigQuery already ran the job; retrying
+        # the upload then would append the same rows or add the same counts again
+        job_id = f"bot_{uuid.uuid4().hex}"
+        try:
+            await self._run_job(submit, *args, job_id=job_id, **kwargs)
+            return
+        except Exception as e:
+            error = e
+        
+        try:
+            job = await self._run_blocking(self.client.get_job, job_id)
+        except NotFound:
+            # The job was never created: safe to retry
+            raise error
+        except Exception as e:
+            raise RuntimeError(f"Outcome of job {job_id} is unknown, not retrying it") from e
+        
+        if job.state != 'DONE':
+            # Still running: wait for it rather than submitting it again
+            try:
+                await self._run_blocking(job.result)
+            except Exception as e:
+                raise RuntimeError(f"Outcome of job {job_id} is unknown, not retrying it") from e
+            return
+        
+        if job.error_result is not None:
+            # The job itself failed, so nothing was applied
+            raise error
+        
+        self.logger.logger.warning(f"⚠️ Job {job_id} succeeded although waiting for it failed: {error}")
+    
+    @staticmethod
+    def _as_timestamps(column: pd.Series) -> pd.Series:
+        """Convert a column to UTC timestamps, skipping the parse when pandas already built a datetime column."""
+        if is_datetime64_any_dtype(column):
+            return column
+        return pd.to_datetime(column, utc=True, cache=True)
+    
     def _prepare_member_data_safe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Prepare member data without manual escaping."""
-        df = df.copy()
+        # The frame was just built from the drained rows and belongs to this upload,
+        # so convert in place instead of copying every column first
         
         # Convert timestamps
-        df['updated_at'] = pd.to_datetime(df['updated_at'])
-        df['joined_at'] = pd.to_datetime(df['joined_at'])        
+        df['updated_at'] = self._as_timestamps(df['updated_at'])
+        df['joined_at'] = self._as_timestamps(df['joined_at'])
+        
+        # Rows carry role names as tuples; join them once per batch instead of once per event
+        df['role'] = df['role'].map(', '.join)
         return df
     
-    def _build_safe_member_merge_query(self, table_id: str) -> str:
-        """Build safe MERGE query using parameters."""
+    def _build_safe_member_merge_query(self, table_id: str, source: str) -> str:
+        """Build the member MERGE from a staging table (values never go into the SQL text)."""
+        # Partial rows (field updates only) leave NULL columns untouched and never insert
         return f"""
         MERGE `{table_id}` T
-        USING (SELECT
-                @user_id AS user_id,
-                @user_name AS user_name,
-                @display_name AS display_name,
-                @is_bot AS is_bot,
-                @is_booster AS is_booster,
-                @role AS role,
-                @joined_at AS joined_at,
-                @status AS status,
-                @updated_at AS updated_at
-            ) S
+        USING {source} S
         ON T.user_id = S.user_id
         WHEN MATCHED THEN
             UPDATE SET
-                T.user_name = S.user_name,
-                T.display_name = S.display_name,
-                T.is_bot = S.is_bot,
-                T.is_booster = S.is_booster,
-                T.role = S.role,
-                T.joined_at = S.joined_at,
-                T.status = S.status,
+                T.user_name = COALESCE(S.user_name, T.user_name),
+                T.display_name = COALESCE(S.display_name, T.display_name),
+                T.is_bot = COALESCE(S.is_bot, T.is_bot),
+                T.is_booster = COALESCE(S.is_booster, T.is_booster),
+                T.role = COALESCE(S.role, T.role),
+                T.joined_at = COALESCE(S.joined_at, T.joined_at),
+                T.status = COALESCE(S.status, T.status),
                 T.updated_at = S.updated_at
-        WHEN NOT MATCHED THEN
+        WHEN NOT MATCHED AND S.is_upsert THEN
             INSERT (user_id, user_name, display_name, is_bot, is_booster, role, joined_at, status, updated_at)
             VALUES (S.user_id, S.user_name, S.display_name, S.is_bot, S.is_booster, S.role, S.joined_at, S.status, S.updated_at);
         """
\ No newline at end of file
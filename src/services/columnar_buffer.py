@@ -0,0 +1,43 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class ColumnarBuffer:
+    """Column-oriented row buffer: one list per field instead of one dict per row."""
+
+    __slots__ = ('columns', '_capacity', '_data', '_lists', 'dropped')
+
+    def __init__(self, columns: Iterable[str], capacity: int):
+        self.columns = tuple(columns)
+        self._capacity = capacity
+        self.dropped = 0
+        self._reset()
+
+    def _reset(self):
+        self._data: Dict[str, List[Any]] = {column: [] for column in self.columns}
+        # Same lists in column order, so appends don't go through the dict
+        self._lists = tuple(self._data.values())
+
+    def __len__(self) -> int:
+        return len(self._lists[0])
+
+    def try_append(self, *values: Any) -> bool:
+        """Append one row given as values in column order. Returns False (and drops the row) when full."""
+        if len(self._lists[0]) >= self._capacity:
+            self.dropped += 1
+            return False
+
+        for column, value in zip(self._lists, values):
+            column.append(value)
+        return True
+
+    def drain(self, max_rows: Optional[int] = None) -> Dict[str, List[Any]]:
+        """Return the buffered columns, oldest first and at most max_rows rows; the rest stays buffered."""
+        if max_rows is None or len(self) <= max_rows:
+            data = self._data
+            self._reset()
+            return data
+
+        data = {column: values[:max_rows] for column, values in self._data.items()}
+        for values in self._lists:
+            del values[:max_rows]
+        return data
@@ -1,174 +1,244 @@
-import pandas as pd
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List
+from config.settings import FLUSH_HIGH_WATER_MARK, BUFFER_MAX_ROWS
+from config.logging_config import BotLogger
+from .ring_buffer import RingBuffer
+from .columnar_buffer import ColumnarBuffer
+
+# Message details columns, in the order MessageHandler passes them
+MESSAGE_DETAIL_COLUMNS = ('message_id', 'created_at', 'user_id', 'channel_id', 'thread_id', 'message_content')
 
 class DataBuffer:
     """Thread-safe data buffer for storing Discord events before BigQuery upload."""
     
+    __slots__ = (
+        '_flush_events', '_details_ready', '_details_full', '_details_wanted',
+        '_full_streams', '_message_counts_dropped', '_voice_dropped', '_presence_dropped', 'logger',
+        'members_buffer', 'member_updates_buffer', 'thread_buffer', 'presence_buffer',
+        'message_details_buffer', 'message_counts_buffer', 'voice_buffer'
+    )
+    
     def __init__(self):
-        self._lock = asyncio.Lock()
+        # No lock: the add_* methods never await, so each one runs to completion on the
+        # event loop before any other handler or drain can touch the same buffer
+        self._flush_events = {
+            stream: asyncio.Event()
+            for stream in ('members', 'messages', 'voice', 'threads', 'presence')
+        }
+        
+        # Wake the message details writer on its first row and once a full batch is buffered
+        self._details_ready = asyncio.Event()
+        self._details_full = asyncio.Event()
+        self._details_wanted = BUFFER_MAX_ROWS
+        
+        # Streams that already warned about being full since their last drain
+        self._full_streams = set()
+        
+        # New keys refused by the full aggregate buffers
+        self._message_counts_dropped = 0
+        self._voice_dropped = 0
+        self._presence_dropped = 0
+        self.logger = BotLogger(__name__)
         self._init_buffers()
     
     def _init_buffers(self):
         """Initialize all data buffers."""
-        self.members_buffer = pd.DataFrame(columns=[
-            'user_id', 'user_name', 'display_name', 'is_bot', 
-            'is_booster', 'role', 'joined_at', 'status', 'updated_at'
-        ])
+        # Event streams keep raw row dicts until they are uploaded
+        self.members_buffer = RingBuffer(BUFFER_MAX_ROWS)
+        self.member_updates_buffer = RingBuffer(BUFFER_MAX_ROWS)
+        self.thread_buffer = RingBuffer(BUFFER_MAX_ROWS)
         
-        self.member_updates_buffer = pd.DataFrame(columns=[
-            'user_id', 'column', 'new_value', 'updated_at'
-        ])
+        # Presence logs are keyed by user: only the first login per user is uploaded
+        self.presence_buffer = {}
         
-        self.message_counts_buffer = pd.DataFrame(columns=[
-            'date', 'user_id', 'channel_id', 'message_count'
-        ])
+        # Message details are the busiest stream: kept column-wise (no dict per row)
+        # and consumed continuously by a batching writer
+        self.message_details_buffer = ColumnarBuffer(MESSAGE_DETAIL_COLUMNS, BUFFER_MAX_ROWS)
         
-        self.message_details_buffer = pd.DataFrame(columns=[
-            'message_id', 'created_at', 'user_id', 'channel_id', 
-            'thread_id', 'message_content'
-        ])
+        # Aggregates keyed by (date, user_id, channel_id): one hash lookup per event,
+        # turned into columns only when drained
+        self.message_counts_buffer = {}
+        self.voice_buffer = {}
+    
+    def _check_high_water(self, stream: str, size: int):
+        """Wake the stream's early flush once its buffer holds too many rows."""
+        if size >= FLUSH_HIGH_WATER_MARK:
+            self._flush_events[stream].set()
+    
+    def _warn_full(self, stream: str, size: int):
+        """Warn once per flush cycle that a stream's buffer is full and dropping rows."""
+        if stream not in self._full_streams:
+            self._full_streams.add(stream)
+            self.logger.logger.warning(f"⚠️ {stream} buffer is full ({size} rows), dropping new rows until it is flushed")
+    
+    async def wait_for_high_water(self, stream: str):
+        """Wait until a stream's buffer crosses the high-water mark."""
+        await self._flush_events[stream].wait()
+        self._flush_events[stream].clear()
+    
+    def reset_high_water(self, stream: str) -> bool:
+        """Clear a stream's early-flush signal; True if its buffer still holds enough rows to flush early."""
+        self._flush_events[stream].clear()
+        return getattr(self, f"{stream}_pending")() >= FLUSH_HIGH_WATER_MARK
+    
+    async def add_member(self, member_data: tuple):
+        """Add a member row to buffer."""
+        if not self.members_buffer.try_push(member_data):
+            self._warn_full('members', len(self.members_buffer))
+        self._check_high_water('members', self.members_pending())
+    
+    async def add_member_update(self, update_data: tuple):
+        """Add a member update row to buffer."""
+        if not self.member_updates_buffer.try_push(update_data):
+            self._warn_full('member_updates', len(self.member_updates_buffer))
+        self._check_high_water('members', self.members_pending())
+    
+    def add_message_count(self, message_data: tuple):
+        """Count one message under its (date, user_id, channel_id) key; synchronous, no await per message."""
+        counts = self.message_counts_buffer
+        if message_data in counts:
+            counts[message_data] += 1
+        elif len(counts) < BUFFER_MAX_ROWS:
+            counts[message_data] = 1
+            self._check_high_water('messages', len(counts))
+        else:
+            self._message_counts_dropped += 1
+            self._warn_full('message_counts', len(counts))
+    
+    async def add_message_detail(self, *values: Any):
+        """Add message detail to buffer, given as values in MESSAGE_DETAIL_COLUMNS order."""
+        buffer = self.message_details_buffer
+        if buffer.try_append(*values):
+            self._details_ready.set()
+            if len(buffer) >= self._details_wanted:
+                self._details_full.set()
+        else:
+            self._warn_full('message_details', len(buffer))
+    
+    async def get_message_details_batch(self, max_rows: int, max_wait: float) -> Dict[str, List[Any]]:
+        """Wait for message details, then return up to max_rows of them as columns once max_rows are buffered or max_wait seconds pass."""
+        self._details_wanted = max_rows
+        await self._details_ready.wait()
         
-        self.voice_buffer = pd.DataFrame(columns=[
-            'date', 'user_id', 'channel_id', 'duration_seconds'
-        ])
+        if len(self.message_details_buffer) < max_rows:
+            try:
+                await asyncio.wait_for(self._details_full.wait(), max_wait)
+            except asyncio.TimeoutError:
+                pass
         
-        self.thread_buffer = pd.DataFrame(columns=[
-            'created_at', 'user_id', 'thread_name', 'channel_id', 'thread_id'
-        ])
+        self._details_ready.clear()
+        self._details_full.clear()
+        self._full_streams.discard('message_details')
+        batch = self.message_details_buffer.drain(max_rows)
         
-        self.presence_buffer = pd.DataFrame(columns=[
-            'logged_at', 'user_id', 'user_name'
-        ])
-    
-    async def add_member(self, member_data: Dict[str, Any]):
-        """Add member data to buffer."""
-        async with self._lock:
-            new_data = pd.DataFrame([member_data])
-            if self.members_buffer.empty:
-                self.members_buffer = new_data
-            else:
-                self.members_buffer = pd.concat([self.members_buffer, new_data], ignore_index=True)
-    
-    async def add_member_update(self, update_data: Dict[str, Any]):
-        """Add member update to buffer."""
-        async with self._lock:
-            new_data = pd.DataFrame([update_data])
-            if self.member_updates_buffer.empty:
-                self.member_updates_buffer = new_data
-            else:
-                self.member_updates_buffer = pd.concat([self.member_updates_buffer, new_data], ignore_index=True)
-    
-    async def add_message_count(self, message_data: Dict[str, Any]):
-        """Add or update message count in buffer."""
-        async with self._lock:
-            date = message_data['date']
-            user_id = message_data['user_id']
-            channel_id = message_data['channel_id']
-            
-            # Check if record exists
-            mask = (
-                (self.message_counts_buffer['date'] == date) &
-                (self.message_counts_buffer['user_id'] == user_id) &
-                (self.message_counts_buffer['channel_id'] == channel_id)
-            )
-            
-            if mask.any():
-                self.message_counts_buffer.loc[mask, 'message_count'] += 1
-            else:
-                new_data = pd.DataFrame([{**message_data, 'message_count': 1}])
-                if self.message_counts_buffer.empty:
-                    self.message_counts_buffer = new_data
-                else:
-                    self.message_counts_buffer = pd.concat([self.message_counts_buffer, new_data], ignore_index=True)
-    
-    async def add_message_detail(self, message_data: Dict[str, Any]):
-        """Add message detail to buffer."""
-        async with self._lock:
-            new_data = pd.DataFrame([message_data])
-            if self.message_details_buffer.empty:
-                self.message_details_buffer = new_data
-            else:
-                self.message_details_buffer = pd.concat([self.message_details_buffer, new_data], ignore_index=True)
-    
-    async def add_voice_activity(self, voice_data: Dict[str, Any]):
+        # Rows beyond max_rows stay buffered for the next batch (sent without waiting once it is full)
+        remaining = len(self.message_details_buffer)
+        if remaining:
+            self._details_ready.set()
+            if remaining >= max_rows:
+                self._details_full.set()
+        return batch
+    
+    async def add_voice_activity(self, voice_data: tuple):
         """Add or update voice activity in buffer."""
-        async with self._lock:
-            date = voice_data['date']
-            user_id = voice_data['user_id']
-            channel_id = voice_data['channel_id']
-            duration = voice_data['duration_seconds']
-            
-            # Check if record exists
-            mask = (
-                (self.voice_buffer['date'] == date) &
-                (self.voice_buffer['user_id'] == user_id) &
-                (self.voice_buffer['channel_id'] == channel_id)
+        date, user_id, channel_id, duration = voice_data
+        key = (date, user_id, channel_id)
+        
+        voice = self.voice_buffer
+        if key in voice:
+            voice[key] += duration
+        elif len(voice) < BUFFER_MAX_ROWS:
+            voice[key] = duration
+            self._check_high_water('voice', len(voice))
+        else:
+            self._voice_dropped += 1
+            self._warn_full('voice', len(voice))
+    
+    async def add_thread(self, thread_data: tuple):
+        """Add a thread row to buffer."""
+        if not self.thread_buffer.try_push(thread_data):
+            self._warn_full('threads', len(self.thread_buffer))
+        self._check_high_water('threads', self.threads_pending())
+    
+    async def add_presence_log(self, presence_data: tuple):
+        """Add a PresenceRow to buffer, unless the user already has a login waiting."""
+        if presence_data.user_id in self.presence_buffer:
+            return
+        if len(self.presence_buffer) >= BUFFER_MAX_ROWS:
+            self._presence_dropped += 1
+            self._warn_full('presence', len(self.presence_buffer))
+            return
+        self.presence_buffer[presence_data.user_id] = presence_data
+        self._check_high_water('presence', self.presence_pending())
+    
+    def presence_logged(self, user_id: str) -> bool:
+        """Whether the user already has a login waiting for the next presence flush."""
+        return user_id in self.presence_buffer
+    
+    # Pending row counts (plain len() reads: no await, so never torn
+    # against the producers on the event loop)
+    def members_pending(self) -> int:
+        return len(self.members_buffer) + len(self.member_updates_buffer)
+    
+    def messages_pending(self) -> int:
+        return len(self.message_counts_buffer)
+    
+    def voice_pending(self) -> int:
+        return len(self.voice_buffer)
+    
+    def threads_pending(self) -> int:
+        return len(self.thread_buffer)
+    
+    def presence_pending(self) -> int:
+        return len(self.presence_buffer)
+    
+    def dropped_rows(self) -> int:
+        """Rows rejected because their buffer was full: new aggregate keys and presence users, plus ring and columnar buffer rows."""
+        return self._message_counts_dropped + self._voice_dropped + self._presence_dropped + sum(
+            buffer.dropped for buffer in (
+                self.members_buffer, self.member_updates_buffer, self.thread_buffer,
+                self.message_details_buffer
             )
-            
-            if mask.any():
-                self.voice_buffer.loc[mask, 'duration_seconds'] += duration
-            else:
-                new_data = pd.DataFrame([voice_data])
-                if self.voice_buffer.empty:
-                    self.voice_buffer = new_data
-                else:
-                    self.voice_buffer = pd.concat([self.voice_buffer, new_data], ignore_index=True)
-    
-    async def add_thread(self, thread_data: Dict[str, Any]):
-        """Add thread data to buffer."""
-        async with self._lock:
-            new_data = pd.DataFrame([thread_data])
-            if self.thread_buffer.empty:
-                self.thread_buffer = new_data
-            else:
-                self.thread_buffer = pd.concat([self.thread_buffer, new_data], ignore_index=True)
-    
-    async def add_presence_log(self, presence_data: Dict[str, Any]):
-        """Add presence log to buffer."""
-        async with self._lock:
-            new_data = pd.DataFrame([presence_data])
-            if self.presence_buffer.empty:
-                self.presence_buffer = new_data
-            else:
-                self.presence_buffer = pd.concat([self.presence_buffer, new_data], ignore_index=True)
-    
-    # Getter methods
-    def get_members_data(self) -> pd.DataFrame:
-        return self.members_buffer.copy()
-    
-    def get_member_updates(self) -> pd.DataFrame:
-        return self.member_updates_buffer.copy()
-    
-    def get_message_counts(self) -> pd.DataFrame:
-        return self.message_counts_buffer.copy()
-    
-    def get_message_details(self) -> pd.DataFrame:
-        return self.message_details_buffer.copy()
-    
-    def get_voice_data(self) -> pd.DataFrame:
-        return self.voice_buffer.copy()
-    
-    def get_thread_data(self) -> pd.DataFrame:
-        return self.thread_buffer.copy()
-    
-    def get_presence_data(self) -> pd.DataFrame:
-        return self.presence_buffer.copy()
-    
-    # Clear methods
-    def clear_members_data(self):
-        self.members_buffer = pd.DataFrame(columns=self.members_buffer.columns)
-        self.member_updates_buffer = pd.DataFrame(columns=self.member_updates_buffer.columns)
-    
-    def clear_message_data(self):
-        self.message_counts_buffer = pd.DataFrame(columns=self.message_counts_buffer.columns)
-        self.message_details_buffer = pd.DataFrame(columns=self.message_details_buffer.columns)
-    
-    def clear_voice_data(self):
-        self.voice_buffer = pd.DataFrame(columns=self.voice_buffer.columns)
-    
-    def clear_thread_data(self):
-        self.thread_buffer = pd.DataFrame(columns=self.thread_buffer.columns)
-    
-    def clear_presence_data(self):
-        self.presence_buffer = pd.DataFrame(columns=self.presence_buffer.columns)
\ No newline at end of file
+        )
+    
+    # Drain methods: return the buffered rows (row tuples, or columns for the aggregated streams)
+    # ready for upload, and empty the buffer.
+    # Rows added while the upload runs land in the fresh buffer for the next flush
+    def drain_members_data(self) -> List[tuple]:
+        self._full_streams.discard('members')
+        return self.members_buffer.drain()
+    
+    def drain_member_updates(self) -> List[tuple]:
+        self._full_streams.discard('member_updates')
+        return self.member_updates_buffer.drain()
+    
+    def drain_message_counts(self) -> Dict[str, List[Any]]:
+        self._full_streams.discard('message_counts')
+        counts, self.message_counts_buffer = self.message_counts_buffer, {}
+        return self._aggregate_columns(counts, 'message_count')
+    
+    def drain_voice_data(self) -> Dict[str, List[Any]]:
+        self._full_streams.discard('voice')
+        voice, self.voice_buffer = self.voice_buffer, {}
+        return self._aggregate_columns(voice, 'duration_seconds')
+    
+    @staticmethod
+    def _aggregate_columns(aggregates: Dict[tuple, int], value_column: str) -> Dict[str, List[Any]]:
+        """Turn a {(date, user_id, channel_id): value} buffer into upload columns."""
+        dates, user_ids, channel_ids = (list(column) for column in zip(*aggregates)) if aggregates else ([], [], [])
+        return {
+            'date': dates,
+            'user_id': user_ids,
+            'channel_id': channel_ids,
+            value_column: list(aggregates.values())
+        }
+    
+    def drain_thread_data(self) -> List[tuple]:
+        self._full_streams.discard('threads')
+        return self.thread_buffer.drain()
+    
+    def drain_presence_data(self) -> List[tuple]:
+        self._full_streams.discard('presence')
+        rows = list(self.presence_buffer.values())
+        self.presence_buffer = {}
+        return rows
@@ -0,0 +1,56 @@
+from typing import Any, List
+
+
+class RingBuffer:
+    """Fixed-capacity ring buffer of rows with one producer (event handlers) and one consumer (the flush)."""
+
+    __slots__ = ('_buf', '_head', '_tail', '_cap', '_mask', 'dropped')
+
+    def __init__(self, capacity: int):
+        # Round capacity up to a power of two so wrapping is a bit mask
+        self._cap = 1 << max(capacity - 1, 1).bit_length()
+        self._mask = self._cap - 1
+        self._buf = [None] * self._cap
+
+        # Monotonic write/read positions, wrapped with the mask on access
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def try_push(self, item: Any) -> bool:
+        """Append an item unless the buffer is full. Returns False (and drops the item) when full."""
+        if self._head - self._tail == self._cap:
+            self.dropped += 1
+            return False
+
+        self._buf[self._head & self._mask] = item
+        self._head += 1
+        return True
+
+    def drain(self) -> List[Any]:
+        """Return all buffered items, oldest first, and empty the buffer."""
+        start = self._tail & self._mask
+        end = start + len(self)
+
+        if end <= self._cap:
+            items = self._buf[start:end]
+        else:
+            items = self._buf[start:] + self._buf[:end - self._cap]
+        self.clear()
+        return items
+
+    def clear(self):
+        """Empty the buffer, releasing references to the stored items."""
+        start = self._tail & self._mask
+        end = start + len(self)
+
+        if end <= self._cap:
+            self._buf[start:end] = [None] * (end - start)
+        else:
+            self._buf[start:] = [None] * (self._cap - start)
+            self._buf[:end - self._cap] = [None] * (end - self._cap)
+
+        self._tail = self._head
@@ -5,14 +5,29 @@ This module contains utility functions and decorators:
 - log_execution_time: Decorator for timing function execution
 - sanitize_string: String sanitization for BigQuery
 - format_roles: Discord roles formatting helper
+- role_names: Role names tuple kept on member rows until upload
+- snowflake_str: Cached string form of recurring Discord IDs
+- utc_now: Per-second cached UTC timestamp for event rows
+- ChannelCache: LRU cache for per-channel metadata used by event handlers
+- FlushScheduler: Min-heap dispatcher that runs the periodic buffer flushes
 """
 
 from .helpers import (
     log_execution_time,
-    format_roles
+    format_roles,
+    role_names,
+    snowflake_str,
+    utc_now
 )
+from .channel_cache import ChannelCache
+from .flush_scheduler import FlushScheduler
 
 __all__ = [
     'log_execution_time', 
-    'format_roles'
+    'format_roles',
+    'role_names',
+    'snowflake_str',
+    'utc_now',
+    'ChannelCache',
+    'FlushScheduler'
 ]
\ No newline at end of file
@@ -0,0 +1,30 @@
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+class ChannelCache:
+    """LRU cache of per-channel metadata resolved from Discord objects."""
+    
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, channel_id: int) -> Optional[Tuple[Hashable, ...]]:
+        """Return cached metadata for a channel, or None on a miss."""
+        meta = self._data.get(channel_id)
+        if meta is not None:
+            self._data.move_to_end(channel_id)
+        return meta
+    
+    def set(self, channel_id: int, meta: Tuple[Hashable, ...]):
+        """Store metadata for a channel, evicting the least recently used entry."""
+        self._data[channel_id] = meta
+        self._data.move_to_end(channel_id)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def invalidate(self, channel_id: int):
+        """Drop a channel from the cache (e.g. after it was updated or deleted)."""
+        self._data.pop(channel_id, None)
@@ -0,0 +1,63 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+Job = Callable[[], Awaitable[None]]
+
+class FlushScheduler:
+    """Single-coroutine dispatcher that fires periodic jobs from a min-heap of due times."""
+    
+    def __init__(self, on_error: Optional[Callable[[BaseException], None]] = None):
+        # (due time, tie-breaker, job, interval in seconds); the counter keeps jobs from being compared
+        self._heap: List[Tuple[float, int, Job, float]] = []
+        self._counter = itertools.count()
+        self._on_error = on_error
+        self._task: Optional[asyncio.Task] = None
+        self._running_jobs: Set[asyncio.Task] = set()
+        self.dispatched = 0
+    
+    def add(self, job: Job, interval_seconds: float, delay_seconds: float = 0.0):
+        """Schedule a job to run after delay_seconds, then every interval_seconds."""
+        due = time.monotonic() + delay_seconds
+        heapq.heappush(self._heap, (due, next(self._counter), job, interval_seconds))
+    
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Start dispatching scheduled jobs on the running event loop."""
+        if not self.is_running():
+            self._task = asyncio.create_task(self._run())
+    
+    def stop(self):
+        """Stop dispatching; jobs already running are left to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    async def _run(self):
+        """Sleep until the earliest job is due, fire it, and push its next due time."""
+        while self._heap:
+            due, _, job, interval = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            
+            # Next run is relative to the previous due time so the cadence never drifts
+            heapq.heapreplace(self._heap, (due + interval, next(self._counter), job, interval))
+            self._dispatch(job)
+    
+    def _dispatch(self, job: Job):
+        """Run a job in its own task so a slow flush never delays the others."""
+        task = asyncio.create_task(job())
+        self._running_jobs.add(task)
+        task.add_done_callback(self._job_done)
+        self.dispatched += 1
+    
+    def _job_done(self, task: asyncio.Task):
+        self._running_jobs.discard(task)
+        if not task.cancelled() and task.exception() is not None and self._on_error:
+            self._on_error(task.exception())
@@ -1,7 +1,12 @@
 import time
-from functools import wraps
+from datetime import datetime, timezone
+from functools import lru_cache, wraps
 from config.logging_config import BotLogger
 
+def elapsed_minutes_seconds(start_ns: int) -> tuple:
+    """Whole minutes and seconds elapsed since a time.perf_counter_ns() reading."""
+    return divmod((time.perf_counter_ns() - start_ns) // 1_000_000_000, 60)
+
 def log_execution_time(func):
     """Decorator to log execution time of functions with improved formatting."""
     @wraps(func)
@@ -12,32 +17,48 @@ def log_execution_time(func):
         else:
             logger = BotLogger(func.__module__)
         
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         try:
             result = await func(*args, **kwargs)
-            end_time = time.time()
-            duration = end_time - start_time
-            
-            minutes = int(duration // 60)
-            seconds = int(duration % 60)
+            minutes, seconds = elapsed_minutes_seconds(start_time)
             
             # Use the improved timing method
             logger.timing(func.__name__, minutes, seconds)
             
             return result
         except Exception as e:
-            end_time = time.time()
-            duration = end_time - start_time
-            minutes = int(duration // 60)
-            seconds = int(duration % 60)
+            minutes, seconds = elapsed_minutes_seconds(start_time)
             
             logger.error(f"{func.__name__} (failed after {minutes}m {seconds}s)", e)
             raise
     return wrapper
 
+# (epoch second, datetime) last returned by utc_now
+_utc_now_cache = (-1, None)
+
+def utc_now() -> datetime:
+    """Current UTC time at one-second resolution; events within the same second share one datetime."""
+    global _utc_now_cache
+    second = int(time.time())
+    if second != _utc_now_cache[0]:
+        _utc_now_cache = (second, datetime.fromtimestamp(second, timezone.utc))
+    return _utc_now_cache[1]
+
+@lru_cache(maxsize=65536)
+def snowflake_str(snowflake: int) -> str:
+    """String form of a Discord ID; the same users and channels recur, so the strings are reused."""
+    return str(snowflake)
+
+# Role names never stored on member rows
+FILTERED_ROLES = frozenset({"@everyone"})
+
+def role_names(roles: list) -> tuple:
+    """Names of a member's roles, without @everyone; joined into a string only at upload."""
+    return tuple(role.name for role in roles if role.name not in FILTERED_ROLES)
+
 def format_roles(roles: list) -> str:
     """Format Discord roles list to string."""
-    return ", ".join([role.name for role in roles if role.name != "@everyone"])
+    return ", ".join(role_names(roles))
 
 def format_duration(seconds: int) -> str:
     """Format duration in seconds to a human-readable string."""
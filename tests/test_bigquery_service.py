@@ -0,0 +1,178 @@
+import asyncio
+import importlib
+import os
+import sys
+import unittest
+from datetime import date
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# config.settings exits when the required variables are missing
+os.environ.setdefault('DISCORD_BOT_TOKEN', 'test-token')
+os.environ.setdefault('TARGET_SERVER_ID', '1')
+os.environ.setdefault('BIGQUERY_PROJECT_ID', 'test-project')
+
+def _installed(*modules: str) -> bool:
+    """Whether all the given modules can be imported."""
+    try:
+        for module in modules:
+            importlib.import_module(module)
+    except ImportError:
+        return False
+    return True
+
+DEPENDENCIES = _installed('google.cloud.bigquery', 'dotenv', 'requests', 'pyarrow')
+
+@unittest.skipUnless(DEPENDENCIES, "google-cloud-bigquery, python-dotenv, requests and pyarrow are required")
+class BigQueryServiceTest(unittest.TestCase):
+    """BigQueryService uploads against a mocked BigQuery client."""
+    
+    def _service(self):
+        from services.bigquery_service import BigQueryService
+        with mock.patch('services.bigquery_service.get_bigquery_client', return_value=mock.MagicMock()):
+            return BigQueryService()
+    
+    def _drained_counts(self, users: int) -> dict:
+        from services.data_buffer import DataBuffer
+        buffer = DataBuffer()
+        for user in range(users):
+            key = (date(2026, 1, 1), str(user), '42')
+            buffer.add_message_count(key)
+            buffer.add_message_count(key)
+        return buffer.drain_message_counts()
+    
+    def test_update_message_counts_merges_drained_columns(self):
+        from config.settings import INLINE_MERGE_MAX_ROWS, get_table_name
+        
+        # Inline (query parameter) and staging table MERGE paths
+        for users in (3, INLINE_MERGE_MAX_ROWS + 1):
+            with self.subTest(users=users):
+                service = self._service()
+                asyncio.run(service.update_message_counts(self._drained_counts(users)))
+                
+                script = service.client.query.call_args.args[0]
+                self.assertIn('MERGE', script)
+                self.assertIn(get_table_name('message_counts'), script)
+                self.assertIn('T.message_count = T.message_count + Temp.message_count', script)
+                service.client.load_table_from_file.assert_not_called()
+    
+    def _message_columns(self, rows: int) -> dict:
+        from utils.helpers import utc_now
+        return {
+            'message_id': [str(row) for row in range(rows)],
+            'created_at': [utc_now()] * rows,
+            'user_id': ['1'] * rows,
+            'channel_id': ['2'] * rows,
+            'thread_id': [None] * rows,
+            'message_content': ['hello'] * rows,
+        }
+    
+    def test_update_message_details_loads_large_column_batches_as_parquet(self):
+        from google.cloud import bigquery
+        from config.settings import JSON_LOAD_MAX_ROWS
+        
+        service = self._service()
+        asyncio.run(service.update_message_details(self._message_columns(JSON_LOAD_MAX_ROWS + 1)))
+        
+        job_config = service.client.load_table_from_file.call_args.kwargs['job_config']
+        self.assertEqual(job_config.source_format, bigquery.SourceFormat.PARQUET)
+        service.client.load_table_from_dataframe.assert_not_called()
+    
+    def test_append_load_is_not_resubmitted_when_polling_fails(self):
+        from google.api_core.exceptions import ServerError
+        from config.settings import JSON_LOAD_MAX_ROWS
+        
+        # NDJSON and Parquet load paths
+        for rows in (2, JSON_LOAD_MAX_ROWS + 1):
+            with self.subTest(rows=rows):
+                service = self._service()
+                service.client.load_table_from_file.return_value.result.side_effect = ServerError('connection reset')
+                service.client.get_job.return_value = mock.MagicMock(state='DONE', error_result=None)
+                asyncio.run(service.update_message_details(self._message_columns(rows)))
+                
+                self.assertEqual(service.client.load_table_from_file.call_count, 1)
+                job_id = service.client.load_table_from_file.call_args.kwargs['job_id']
+                service.client.get_job.assert_called_once_with(job_id)
+    
+    def _member_frames(self, members: list, updates: list):
+        import pandas as pd
+        from config.bigquery_config import SCHEMAS
+        columns = [field.name for field in SCHEMAS['members']]
+        return (
+            pd.DataFrame(members, columns=columns),
+            pd.DataFrame(updates, columns=['user_id', 'column', 'new_value', 'updated_at'])
+        )
+    
+    def test_member_leave_in_the_join_second_wins(self):
+        from utils.helpers import utc_now
+        
+        now = utc_now()
+        members_df, updates_df = self._member_frames(
+            [('1', 'name', 'Name', False, False, ('role',), now, 'online', now)],
+            [('1', 'status', 'left', now)]
+        )
+        staged = self._service()._combine_member_changes(members_df, updates_df)
+        
+        self.assertEqual(len(staged), 1)
+        row = staged.iloc[0]
+        self.assertEqual(row['status'], 'left')
+        self.assertEqual(row['role'], 'role')
+        self.assertTrue(row['is_upsert'])
+    
+    def test_member_update_older_than_join_is_ignored(self):
+        from datetime import timedelta
+        from utils.helpers import utc_now
+        
+        now = utc_now()
+        members_df, updates_df = self._member_frames(
+            [('1', 'name', 'Name', False, False, (), now, 'online', now)],
+            [('1', 'status', 'left', now - timedelta(seconds=1)), ('2', 'user_name', 'renamed', now)]
+        )
+        staged = self._service()._combine_member_changes(members_df, updates_df).set_index('user_id')
+        
+        self.assertEqual(staged.loc['1', 'status'], 'online')
+        self.assertEqual(staged.loc['2', 'user_name'], 'renamed')
+        self.assertFalse(staged.loc['2', 'is_upsert'])
+    
+    def test_only_rate_limit_and_quota_403s_are_transient(self):
+        from google.api_core.exceptions import Forbidden, ServerError
+        from services.bigquery_service import is_transient_error
+        
+        self.assertTrue(is_transient_error(Forbidden('slow down', errors=[{'reason': 'rateLimitExceeded'}])))
+        self.assertTrue(is_transient_error(Forbidden('quota', errors=[{'reason': 'quotaExceeded'}])))
+        self.assertFalse(is_transient_error(Forbidden('denied', errors=[{'reason': 'accessDenied'}])))
+        self.assertTrue(is_transient_error(ServerError('backend error')))
+        self.assertFalse(is_transient_error(ValueError('bad batch')))
+    
+    def test_aggregate_merge_is_not_resubmitted_when_polling_fails(self):
+        from google.api_core.exceptions import NotFound, ServerError
+        
+        # The job ran, only waiting for it failed: the upload succeeds without a second MERGE
+        service = self._service()
+        service.client.query.return_value.result.side_effect = ServerError('connection reset')
+        service.client.get_job.return_value = mock.MagicMock(state='DONE', error_result=None)
+        asyncio.run(service.update_message_counts(self._drained_counts(3)))
+        self.assertEqual(service.client.query.call_count, 1)
+        
+        # The job was never created: the original error is raised so the upload can be retried
+        service = self._service()
+        service.client.query.side_effect = ServerError('unavailable')
+        service.client.get_job.side_effect = NotFound('no such job')
+        with self.assertRaises(ServerError):
+            asyncio.run(service.update_message_counts(self._drained_counts(3)))
+    
+    def test_failed_staging_drop_does_not_fail_the_merge(self):
+        from google.api_core.exceptions import ServerError
+        from config.settings import INLINE_MERGE_MAX_ROWS
+        
+        service = self._service()
+        service.client.delete_table.side_effect = ServerError('backend error')
+        asyncio.run(service.update_message_counts(self._drained_counts(INLINE_MERGE_MAX_ROWS + 1)))
+        
+        self.assertEqual(service.client.query.call_count, 1)
+        self.assertNotIn('DROP TABLE', service.client.query.call_args.args[0])
+        service.client.delete_table.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
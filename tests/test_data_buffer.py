@@ -0,0 +1,70 @@
+import asyncio
+import importlib
+import os
+import sys
+import unittest
+from datetime import date
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# config.settings exits when the required variables are missing
+os.environ.setdefault('DISCORD_BOT_TOKEN', 'test-token')
+os.environ.setdefault('TARGET_SERVER_ID', '1')
+os.environ.setdefault('BIGQUERY_PROJECT_ID', 'test-project')
+
+def _installed(*modules: str) -> bool:
+    """Whether all the given modules can be imported."""
+    try:
+        for module in modules:
+            importlib.import_module(module)
+    except ImportError:
+        return False
+    return True
+
+# The services package also imports BigQueryService
+DEPENDENCIES = _installed('google.cloud.bigquery', 'dotenv', 'requests', 'pyarrow')
+
+@unittest.skipUnless(DEPENDENCIES, "google-cloud-bigquery, python-dotenv, requests and pyarrow are required")
+class DataBufferTest(unittest.TestCase):
+    """DataBuffer high-water signalling and message details batching."""
+    
+    def test_high_water_signal_is_rechecked_after_a_flush(self):
+        from services import data_buffer
+        
+        with mock.patch.object(data_buffer, 'FLUSH_HIGH_WATER_MARK', 2):
+            buffer = data_buffer.DataBuffer()
+            for user in range(3):
+                buffer.add_message_count((date(2026, 1, 1), str(user), '42'))
+            asyncio.run(asyncio.wait_for(buffer.wait_for_high_water('messages'), 1))
+            
+            # Rows added while a flush runs signal again; still above the mark: flush
+            buffer.add_message_count((date(2026, 1, 1), '3', '42'))
+            self.assertTrue(buffer.reset_high_water('messages'))
+            self.assertFalse(buffer._flush_events['messages'].is_set())
+            
+            # The running flush already drained them: nothing left to flush early
+            buffer.add_message_count((date(2026, 1, 1), '4', '42'))
+            buffer.drain_message_counts()
+            self.assertFalse(buffer.reset_high_water('messages'))
+    
+    def test_message_details_batches_are_capped_at_max_rows(self):
+        from services.data_buffer import DataBuffer
+        
+        buffer = DataBuffer()
+        for message in range(7):
+            asyncio.run(buffer.add_message_detail(str(message), None, '1', '2', None, 'hello'))
+        
+        first = asyncio.run(buffer.get_message_details_batch(3, 0))
+        self.assertEqual(first['message_id'], ['0', '1', '2'])
+        
+        # A full batch is still buffered: returned without waiting
+        second = asyncio.run(asyncio.wait_for(buffer.get_message_details_batch(3, 60), 1))
+        self.assertEqual(second['message_id'], ['3', '4', '5'])
+        
+        third = asyncio.run(buffer.get_message_details_batch(3, 0))
+        self.assertEqual(third['message_id'], ['6'])
+        self.assertEqual(len(buffer.message_details_buffer), 0)
+
+if __name__ == '__main__':
+    unittest.main()